@@ -0,0 +1,124 @@
+import json
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from agents.metrics import metrics
+from agents.rate_limiter import INTERACTIVE, BACKGROUND, QuotaExceeded, current_priority, rate_limiter
+from agents.resilience import CircuitOpen, circuit_breakers
+
+BATCH_PROMPT_HEADER = """
+As a learning content recommendation system, you will evaluate several independent ranking jobs.
+Each job describes one student profile and a numbered list of content items.
+
+For every job, rank its content items from 1-5 (5 being most relevant) based on:
+1. Relevance to the student's topic and field
+2. Appropriateness of complexity level
+3. Efficiency given their time constraints
+4. Educational value
+
+Return ONLY a JSON object mapping each job id to an array of objects containing content index (1-based) and score (1-5).
+Example: {"job-1": [{"index": 1, "score": 4}, {"index": 2, "score": 5}], "job-2": [{"index": 1, "score": 3}]}
+"""
+
+
+class RankingBatcher:
+    """Collects concurrent ranking jobs over a short window and sends them to Gemini in one prompt"""
+
+    def __init__(self, model: Any, window: float = 0.03, max_batch: int = 8, job_timeout: float = 2.0):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self.job_timeout = job_timeout
+        self._pending: List[Tuple[str, str, str, asyncio.Future]] = []  # (id, text, priority, future)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._next_id = 0
+        self._sending = set()  # Keep references to in-flight sends
+        self.batches_sent = 0
+        self.jobs_sent = 0
+        self.failed_batches = 0
+
+    async def submit(self, job_text: str) -> List[Dict[str, Any]]:
+        """Queue one ranking job and wait for its own scores"""
+        loop = asyncio.get_running_loop()
+        self._next_id += 1
+        job_id = f"job-{self._next_id}"
+        future = loop.create_future()
+        self._pending.append((job_id, job_text, current_priority(), future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await asyncio.wait_for(future, timeout=self.job_timeout)
+
+    def _flush(self):
+        """Send up to max_batch pending jobs as one request"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Jobs whose caller already gave up are not worth sending
+        self._pending = [job for job in self._pending if not job[3].done()]
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[Tuple[str, str, str, asyncio.Future]]):
+        self.batches_sent += 1
+        self.jobs_sent += len(batch)
+        jobs_text = "\n\n".join(f"=== Job {job_id} ===\n{job_text}" for job_id, job_text, _, _ in batch)
+        prompt = BATCH_PROMPT_HEADER + "\n" + jobs_text
+
+        # A batch carrying any interactive job is sent with interactive priority
+        priority = INTERACTIVE if any(job[2] == INTERACTIVE for job in batch) else BACKGROUND
+        breaker = circuit_breakers['gemini']
+        try:
+            # Fail every job at once while Gemini is degraded, so callers fall back to local ranking
+            breaker.check()
+            await rate_limiter.acquire('gemini', 'generate', priority)
+        except (QuotaExceeded, CircuitOpen) as e:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        metrics.inc('external_calls_total', api='gemini', call='rank_batch')
+        try:
+            with metrics.span('gemini.rank_batch'), breaker.track():
+                response = await self.model.generate_content_async(prompt)
+            response_text = response.text
+
+            # Extract JSON from response
+            start_idx = response_text.find('{')
+            end_idx = response_text.rfind('}') + 1
+            if start_idx < 0 or end_idx <= start_idx:
+                raise ValueError("No JSON object in batched ranking response")
+            results = json.loads(response_text[start_idx:end_idx])
+
+            for job_id, _, _, future in batch:
+                if future.done():
+                    continue
+                if isinstance(results.get(job_id), list):
+                    future.set_result(results[job_id])
+                else:
+                    future.set_exception(ValueError(f"No scores returned for {job_id}"))
+        except Exception as e:
+            self.failed_batches += 1
+            metrics.inc('external_call_failures_total', api='gemini', call='rank_batch')
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self) -> Dict[str, float]:
+        """Return batch counters and the mean batch fill rate (jobs per batch / max_batch)"""
+        fill_rate = self.jobs_sent / (self.batches_sent * self.max_batch) if self.batches_sent else 0.0
+        return {
+            'batches_sent': self.batches_sent,
+            'jobs_sent': self.jobs_sent,
+            'failed_batches': self.failed_batches,
+            'mean_batch_size': self.jobs_sent / self.batches_sent if self.batches_sent else 0.0,
+            'fill_rate': round(fill_rate, 3)
+        }
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data'))
+# Persisted caches write their file at most this often (seconds), off the event loop
+CACHE_PERSIST_INTERVAL = float(os.getenv('CACHE_PERSIST_INTERVAL', '60'))
+
+
+def normalize_query(*parts: str) -> str:
+    """Normalize query parts so equivalent searches share one cache key"""
+    words = []
+    for part in parts:
+        words.extend(str(part or '').lower().split())
+    return " ".join(words)
+
+
+def hours_bucket(hours: Any) -> float:
+    """Bucket daily study hours so small changes reuse the same memoized results"""
+    try:
+        hours = float(hours)
+    except (TypeError, ValueError):
+        hours = 1.0
+    for bucket in (0.5, 1, 2, 4):
+        if hours <= bucket:
+            return float(bucket)
+    return 8.0
+
+
+def profile_key(preferences: Dict[str, Any]) -> str:
+    """Build a normalized key from a preference profile (field, topic, bucketed hours)"""
+    return "|".join([
+        normalize_query(preferences.get('field', '')),
+        normalize_query(preferences.get('topic', '')),
+        str(hours_bucket(preferences.get('hours', 1)))
+    ])
+
+
+class TTLCache:
+    """In-memory LRU cache with per-entry TTL and optional JSON persistence.
+
+    Writes only mark the cache dirty; save() (or snapshot() and write()) persists it.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        max_entries: int = 1000,
+        persist_path: Optional[str] = None,
+        codec: Optional[Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = None,
+        keep_stale: bool = False
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        # (encode, decode) applied only when values are written to or read from the file
+        self.codec = codec
+        # Keep expired entries until they are evicted, so get_stale can still serve them
+        self.keep_stale = keep_stale
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dirty = False  # Entries changed since the last snapshot
+        self._write_lock = threading.Lock()
+
+        if self.persist_path:
+            self._load()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            if not self.keep_stale:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: str, max_stale: Optional[float] = None) -> Optional[Any]:
+        """Return a value even if it has expired, or None if it was never cached or was dropped.
+
+        Without keep_stale an expired entry is dropped on its first get. With max_stale, entries
+        that expired more than max_stale seconds ago are treated as missing.
+        """
+        entry = self._entries.get(key)
+        if entry is None or (max_stale is not None and time.time() - entry[0] > max_stale):
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value and evict the least recently used entries over the limit"""
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self.dirty = bool(self.persist_path)
+
+    def delete(self, key: str) -> None:
+        """Remove a single entry if present"""
+        if self._entries.pop(key, None) is not None:
+            self.dirty = bool(self.persist_path)
+
+    def save(self) -> None:
+        """Write the entries to the persistence file now if they changed"""
+        entries = self.snapshot()
+        if entries is not None:
+            self.write(entries)
+
+    def snapshot(self) -> Optional[List[Tuple[str, Tuple[float, Any]]]]:
+        """Take the entries to persist and clear the dirty flag, or None if nothing changed"""
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return list(self._entries.items())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries)
+        }
+
+    def _load(self):
+        """Load unexpired entries from the persistence file"""
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            decode = self.codec[1] if self.codec else None
+            for key, expires_at, value in data:
+                if expires_at > now:
+                    self._entries[key] = (expires_at, decode(value) if decode else value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        except Exception as e:
+            print(f"Error loading cache file {self.persist_path}: {e}")
+            self._entries.clear()
+
+    def write(self, entries: List[Tuple[str, Tuple[float, Any]]]) -> None:
+        """Write a snapshot to the persistence file via an atomic rename; safe to call from a worker thread"""
+        try:
+            with self._write_lock:
+                os.makedirs(os.path.dirname(self.persist_path) or '.', exist_ok=True)
+                tmp_path = self.persist_path + '.tmp'
+                encode = self.codec[0] if self.codec else None
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump([[k, exp, encode(v) if encode else v] for k, (exp, v) in entries], f)
+                os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            print(f"Error saving cache file {self.persist_path}: {e}")
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+from dotenv import load_dotenv
+from agents.cache import DATA_DIR
+from agents.local_ranker import tokenize
+from agents.content_item import ContentItem
+
+load_dotenv()
+# Persistent catalog of every fetched item; empty disables it
+CATALOG_DB = os.getenv('CATALOG_DB', os.path.join(DATA_DIR, 'content_catalog.db'))
+CATALOG_MAX_AGE = float(os.getenv('CATALOG_MAX_AGE', '604800'))  # 7 days
+# Items older than CATALOG_MAX_AGE, and their postings, are deleted on the first add and every this many after
+PRUNE_EVERY_ADDS = 100
+
+# Posting weights per field; an item's weight for a token is the best field it appears in
+FIELD_WEIGHTS = {'title': 3, 'description': 1}
+# Bumped whenever postings are built differently; older databases are reindexed from items
+SCHEMA_VERSION = 1
+
+
+class ContentCatalog:
+    """SQLite catalog of fetched content, deduplicated by link, with an inverted token index.
+
+    Each item keeps the query that found it, its duration, views and fetch time;
+    postings map tokens from an item's own title and description to it. The query
+    that found an item is not indexed, since it says nothing about the item's content.
+    """
+
+    def __init__(self, db_path: str, max_age: float = CATALOG_MAX_AGE):
+        self.db_path = db_path
+        self.max_age = max_age
+        self._conn = None
+        self._adds = 0
+        # One worker keeps every sqlite call on the same thread and off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='content-catalog')
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "link TEXT PRIMARY KEY, source TEXT NOT NULL, query TEXT NOT NULL, "
+                "duration_minutes INTEGER, views INTEGER, fetched_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS items_source ON items (source, fetched_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS items_fetched ON items (fetched_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "token TEXT NOT NULL, link TEXT NOT NULL, weight INTEGER NOT NULL, "
+                "PRIMARY KEY (token, link)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_link ON postings (link)")
+            conn.commit()
+            self._conn = conn
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._reindex()
+        return self._conn
+
+    def _reindex(self):
+        """Rebuild every posting from the stored items"""
+        conn = self._conn
+        with conn:
+            conn.execute("DELETE FROM postings")
+            for link, data in conn.execute("SELECT link, data FROM items").fetchall():
+                self._index(link, ContentItem.decode(json.loads(data)))
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _index(self, link: str, item: ContentItem) -> None:
+        weights = {}
+        for field in ('description', 'title'):
+            for token in tokenize(getattr(item, field)):
+                weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+        self._conn.executemany(
+            "INSERT INTO postings (token, link, weight) VALUES (?, ?, ?) "
+            "ON CONFLICT(token, link) DO UPDATE SET weight = excluded.weight",
+            [(token, link, weight) for token, weight in weights.items()]
+        )
+
+    def _add(self, source: str, query: str, items: List[ContentItem]) -> None:
+        conn = self._connection()
+        if self._adds % PRUNE_EVERY_ADDS == 0:
+            self._prune()
+        self._adds += 1
+        now = time.time()
+        with conn:
+            for item in items:
+                link = item.link
+                if not link:
+                    continue
+                conn.execute(
+                    "INSERT INTO items (link, source, query, duration_minutes, views, fetched_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(link) DO UPDATE SET query = excluded.query, duration_minutes = excluded.duration_minutes, "
+                    "views = excluded.views, fetched_at = excluded.fetched_at, data = excluded.data",
+                    (link, source, query, item.duration_minutes, item.views, now, json.dumps(item.to_row()))
+                )
+                # A refetched item may have a new title or description; drop postings of the old text
+                conn.execute("DELETE FROM postings WHERE link = ?", (link,))
+                self._index(link, item)
+
+    def _prune(self) -> int:
+        """Delete items older than max_age and their postings; returns the number of items deleted"""
+        conn = self._connection()
+        cutoff = time.time() - self.max_age
+        with conn:
+            conn.execute(
+                "DELETE FROM postings WHERE link IN (SELECT link FROM items WHERE fetched_at < ?)", (cutoff,)
+            )
+            return conn.execute("DELETE FROM items WHERE fetched_at < ?", (cutoff,)).rowcount
+
+    def _search(self, source: str, query: str, limit: int, required: Optional[str]) -> List[ContentItem]:
+        required_tokens = sorted(set(tokenize(required if required is not None else query)))
+        if not required_tokens:
+            return []
+        # Every required token must appear in the item itself; the rest of the query only ranks
+        tokens = required_tokens + sorted(set(tokenize(query)) - set(required_tokens))
+        placeholders = ','.join('?' * len(tokens))
+        required_placeholders = ','.join('?' * len(required_tokens))
+        rows = self._connection().execute(
+            "SELECT i.data, COUNT(*) AS matched, SUM(p.weight) AS score "
+            "FROM postings p JOIN items i ON i.link = p.link "
+            f"WHERE p.token IN ({placeholders}) AND i.source = ? AND i.fetched_at >= ? "
+            f"GROUP BY p.link HAVING SUM(p.token IN ({required_placeholders})) = ? "
+            "ORDER BY matched DESC, score DESC, i.views DESC LIMIT ?",
+            (*tokens, source, time.time() - self.max_age, *required_tokens, len(required_tokens), limit)
+        ).fetchall()
+        return [ContentItem.decode(json.loads(row[0])) for row in rows]
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def add(self, source: str, query: str, items: List[ContentItem]) -> None:
+        """Record items returned for a query; existing links are refreshed, not duplicated"""
+        if items:
+            await self._run(self._add, source, query, items)
+
+    async def prune(self) -> int:
+        """Delete items past max_age now instead of waiting for the next add"""
+        return await self._run(self._prune)
+
+    async def search(self, source: str, query: str, limit: int, required: Optional[str] = None) -> List[ContentItem]:
+        """Return up to limit fresh items from source containing every token of required (default: the query).
+
+        The query's other tokens, e.g. the field of study around a topic, only rank the matches.
+        """
+        return await self._run(self._search, source, query, limit, required)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+
+
+def create_catalog() -> Optional[ContentCatalog]:
+    """Build the content catalog unless CATALOG_DB is empty"""
+    return ContentCatalog(CATALOG_DB) if CATALOG_DB else None
@@ -1,87 +1,225 @@
 import os
 import json
+import time
 import asyncio
-from typing import Dict, List, Any
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from typing import Awaitable, Dict, List, Any, Optional, Tuple
 import aiohttp
 from dotenv import load_dotenv
+from agents.cache import normalize_query
+from agents.singleflight import SingleFlight
+from agents.catalog import create_catalog
+from agents.content_item import ContentItem
+from agents.metrics import metrics
+from agents.rate_limiter import rate_limiter
+from agents.resilience import LatencyTracker, circuit_breakers, hedged
 
 load_dotenv()
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 SERP_API_KEY = os.getenv('SERP_API_KEY')
+YOUTUBE_API_URL = os.getenv('YOUTUBE_API_URL', "https://www.googleapis.com/youtube/v3")
+SERP_API_URL = os.getenv('SERP_API_URL', "https://serpapi.com/search")
+# Outbound connection pool shared by every search; tune to the expected concurrency
+HTTP_POOL_SIZE = int(os.getenv('CONTENT_HTTP_POOL_SIZE', '50'))
+HTTP_TIMEOUT = float(os.getenv('CONTENT_HTTP_TIMEOUT', '10'))
+# Optionally send a second YouTube request when the first is slower than this percentile
+YOUTUBE_HEDGE = os.getenv('YOUTUBE_HEDGE', 'false').lower() == 'true'
+YOUTUBE_HEDGE_PERCENTILE = float(os.getenv('YOUTUBE_HEDGE_PERCENTILE', '95'))
+YOUTUBE_HEDGE_MIN_DELAY = float(os.getenv('YOUTUBE_HEDGE_MIN_DELAY', '0.1'))
+# YouTube Data API quota units per call
+YOUTUBE_QUOTA_COSTS = {'search': 100, 'videos': 1}
+
+# One page of results and the cursor of the next page (YouTube pageToken or SerpAPI start), None at the end
+Page = Tuple[List[ContentItem], Any]
 
 class ContentAgent:
     def __init__(self):
-        self.youtube_service = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+        self._session = None
+        # Identical searches already in flight share one upstream request
+        self.inflight = SingleFlight()
+        # Every item we fetch is kept in the local catalog for reuse by similar queries
+        self.catalog = create_catalog()
+        self.youtube_latency = {resource: LatencyTracker() for resource in YOUTUBE_QUOTA_COSTS}
+    
+    async def start(self) -> None:
+        """Open the long-lived pooled HTTP session (keep-alive and DNS caching)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+            )
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self.catalog is not None:
+            await self.catalog.close()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+    
+    async def _youtube_get(self, resource: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a YouTube Data API v3 resource over the pooled session"""
+        breaker = circuit_breakers['youtube']
+        breaker.check()
+        params = dict(params, key=YOUTUBE_API_KEY)
+        await self._charge_youtube(resource)
+        with metrics.span(f"youtube.{resource}"), breaker.track():
+            started = time.perf_counter()
+            delay = self._hedge_delay(resource)
+            if delay is None:
+                result = await self._youtube_request(resource, params)
+            else:
+                # The hedge is charged like any call, so it is skipped when the budget is short
+                result = await hedged(
+                    lambda: self._youtube_request(resource, params),
+                    delay,
+                    before_hedge=lambda: self._charge_youtube(resource)
+                )
+            self.youtube_latency[resource].observe(time.perf_counter() - started)
+            return result
     
-    async def search_youtube_videos(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    async def _charge_youtube(self, resource: str) -> None:
+        await rate_limiter.acquire('youtube', resource)
+        metrics.inc('youtube_quota_units_total', YOUTUBE_QUOTA_COSTS.get(resource, 1), call=resource)
+    
+    def _hedge_delay(self, resource: str) -> Optional[float]:
+        if not YOUTUBE_HEDGE:
+            return None
+        deadline = self.youtube_latency[resource].percentile(YOUTUBE_HEDGE_PERCENTILE)
+        return None if deadline is None else max(deadline, YOUTUBE_HEDGE_MIN_DELAY)
+    
+    async def _youtube_request(self, resource: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        session = await self._get_session()
+        metrics.inc('external_calls_total', api='youtube', call=resource)
+        try:
+            async with session.get(f"{YOUTUBE_API_URL}/{resource}", params=params) as response:
+                response.raise_for_status()
+                return await response.json()
+        except Exception:
+            metrics.inc('external_call_failures_total', api='youtube', call=resource)
+            raise
+    
+    async def _cataloged(self, source: str, query: str, search: Awaitable[Page]) -> Page:
+        """Run a search and record its results in the catalog"""
+        results, cursor = await search
+        if self.catalog is not None and results:
+            try:
+                await self.catalog.add(source, query, results)
+            except Exception as e:
+                print(f"Error adding results to the content catalog: {e}")
+        return results, cursor
+    
+    async def search_youtube_videos(self, query: str, max_results: int = 5) -> List[ContentItem]:
         """Search for educational videos on YouTube"""
+        results, _ = await self.search_youtube_page(query, max_results)
+        return results
+    
+    async def search_youtube_page(self, query: str, max_results: int = 5, page_token: Optional[str] = None) -> Page:
+        """Search one page of YouTube videos; returns the videos and the nextPageToken"""
+        return await self.inflight.do(
+            ('youtube', normalize_query(query), max_results, page_token),
+            lambda: self._cataloged('youtube', query, self._search_youtube_videos(query, max_results, page_token))
+        )
+    
+    @metrics.timed('content.youtube')
+    async def _search_youtube_videos(self, query: str, max_results: int, page_token: Optional[str] = None) -> Page:
         try:
-            # Create a task for asynchronous execution
-            loop = asyncio.get_event_loop()
-            search_response = await loop.run_in_executor(
-                None,
-                lambda: self.youtube_service.search().list(
-                    q=query + " tutorial lecture",
-                    part="snippet",
-                    maxResults=max_results,
-                    type="video",
-                    videoEmbeddable="true",
-                    order="relevance",
-                    videoDefinition="high"
-                ).execute()
-            )
+            params = {
+                'q': query + " tutorial lecture",
+                'part': "snippet",
+                'maxResults': max_results,
+                'type': "video",
+                'videoEmbeddable': "true",
+                'order': "relevance",
+                'videoDefinition': "high"
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            search_response = await self._youtube_get('search', params)
             
             # Check if we have results
             if not search_response.get('items'):
                 print(f"No YouTube results found for query: {query}")
-                return []
+                return [], None
             
-            video_ids = [item['id']['videoId'] for item in search_response['items']]
+            video_ids = [item['id']['videoId'] for item in search_response['items'] if 'videoId' in item.get('id', {})]
+            if not video_ids:
+                # Only channels or playlists matched; there are no video details worth a call
+                return [], search_response.get('nextPageToken')
             
             # Get video details
-            video_response = await loop.run_in_executor(
-                None,
-                lambda: self.youtube_service.videos().list(
-                    part="contentDetails,snippet,statistics",
-                    id=",".join(video_ids)
-                ).execute()
-            )
+            video_response = await self._youtube_get('videos', {
+                'part': "contentDetails,snippet,statistics",
+                'id': ",".join(video_ids)
+            })
             
             results = []
-            for item in video_response['items']:
-                # Convert duration to minutes
-                duration = item['contentDetails']['duration'].replace('PT', '')
-                minutes = 0
-                if 'H' in duration:
-                    h, duration = duration.split('H')
-                    minutes += int(h) * 60
-                if 'M' in duration:
-                    if 'S' in duration:
-                        m, s = duration.split('M')
-                        minutes += int(m)
-                    else:
-                        minutes += int(duration.replace('M', ''))
-                
-                results.append({
-                    'title': item['snippet']['title'],
-                    'description': item['snippet']['description'],
-                    'link': f"https://www.youtube.com/watch?v={item['id']}",
-                    'thumbnail': item['snippet']['thumbnails']['high']['url'],
-                    'duration': f"{minutes} menit",
-                    'views': item['statistics'].get('viewCount', '0'),
-                    'source': 'youtube',
-                    'type': 'video'
-                })
+            for item in video_response.get('items', []):
+                # A malformed item is skipped instead of failing the whole page
+                try:
+                    results.append(self._parse_video(item))
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    metrics.inc('content_parse_errors_total', source='youtube')
+                    print(f"Skipping malformed YouTube item: {e!r}")
                 
-            return results
-        except HttpError as e:
+            return results, search_response.get('nextPageToken')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Raised, not swallowed, so callers can tell a failed search from one with no results
             print(f"YouTube API error: {e}")
-            return []
+            raise
     
-    async def search_articles(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _parse_video(item: Dict[str, Any]) -> ContentItem:
+        """Build a ContentItem from one videos.list item"""
+        # Convert duration to minutes
+        duration = item['contentDetails']['duration'].replace('PT', '')
+        minutes = 0
+        if 'H' in duration:
+            h, duration = duration.split('H')
+            minutes += int(h) * 60
+        if 'M' in duration:
+            if 'S' in duration:
+                m, s = duration.split('M')
+                minutes += int(m)
+            else:
+                minutes += int(duration.replace('M', ''))
+        
+        return ContentItem(
+            title=item['snippet']['title'],
+            description=item['snippet'].get('description', ''),
+            link=f"https://www.youtube.com/watch?v={item['id']}",
+            source='youtube',
+            duration_minutes=minutes,
+            views=int(item.get('statistics', {}).get('viewCount', 0))
+        )
+    
+    async def search_articles(self, query: str, max_results: int = 5) -> List[ContentItem]:
         """Search for educational articles using SERP API"""
+        results, _ = await self.search_articles_page(query, max_results)
+        return results
+    
+    async def search_articles_page(self, query: str, max_results: int = 5, start: int = 0) -> Page:
+        """Search one page of articles from offset start; returns the articles and the next offset"""
+        return await self.inflight.do(
+            ('web', normalize_query(query), max_results, start),
+            lambda: self._cataloged('web', query, self._search_articles(query, max_results, start))
+        )
+    
+    @metrics.timed('content.serp')
+    async def _search_articles(self, query: str, max_results: int, start: int = 0) -> Page:
+        # Raises QuotaExceeded or CircuitOpen so the coordinator can fall back to cached results
+        breaker = circuit_breakers['serp']
+        breaker.check()
+        await rate_limiter.acquire('serp', 'search')
         try:
             params = {
                 "q": query + " tutorial guide",
@@ -94,24 +232,34 @@ class ContentAgent:
                 "safe": "active",
                 "location": "Indonesia"
             }
+            if start:
+                params["start"] = start
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get("https://serpapi.com/search", params=params) as response:
+            session = await self._get_session()
+            metrics.inc('external_calls_total', api='serp', call='search')
+            with breaker.track():
+                async with session.get(SERP_API_URL, params=params) as response:
+                    response.raise_for_status()
                     data = await response.json()
-                    
-                    results = []
-                    if 'organic_results' in data:
-                        for item in data['organic_results'][:max_results]:
-                            results.append({
-                                'title': item['title'],
-                                'description': item.get('snippet', ''),
-                                'link': item['link'],
-                                'source': 'web',
-                                'type': 'article',
-                                'duration': '10-15 menit'  # Estimated reading time
-                            })
-                    
-                    return results
+            
+            results = []
+            organic_results = data.get('organic_results', [])[:max_results]
+            for item in organic_results:
+                try:
+                    results.append(ContentItem(
+                        title=item['title'],
+                        description=item.get('snippet', ''),
+                        link=item['link'],
+                        source='web'
+                    ))
+                except (KeyError, TypeError, AttributeError) as e:
+                    metrics.inc('content_parse_errors_total', source='web')
+                    print(f"Skipping malformed SERP result: {e!r}")
+            
+            # A short page means there is nothing further to fetch
+            fetched = len(organic_results)
+            return results, start + fetched if fetched >= max_results else None
         except Exception as e:
+            metrics.inc('external_call_failures_total', api='serp', call='search')
             print(f"SERP API error: {e}")
-            return []
\ No newline at end of file
+            raise
\ No newline at end of file
@@ -0,0 +1,105 @@
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+# Descriptions are cut to this many characters when an item is created
+DESCRIPTION_CHARS = int(os.getenv('CONTENT_DESCRIPTION_CHARS', '300'))
+ARTICLE_DURATION_LABEL = '10-15 menit'  # Estimated reading time shown for articles
+NUMBER_RE = re.compile(r"\d+")
+
+
+def _first_int(value: Any) -> Optional[int]:
+    if isinstance(value, int):
+        return value
+    match = NUMBER_RE.search(str(value or ''))
+    return int(match.group()) if match else None
+
+
+class ContentItem:
+    """Compact record of one video or article; text shown to users is formatted on render.
+
+    Durations (minutes) and views are numbers, the description is truncated and interned,
+    and the type and thumbnail are derived from the source and link instead of stored.
+    """
+
+    __slots__ = ('title', 'description', 'link', 'source', 'duration_minutes', 'views')
+
+    def __init__(
+        self,
+        title: str,
+        description: str,
+        link: str,
+        source: str,
+        duration_minutes: Optional[int] = None,
+        views: int = 0
+    ):
+        self.title = title
+        # The same video often comes back for several queries; interning shares its text
+        self.description = sys.intern(description[:DESCRIPTION_CHARS])
+        self.link = link
+        self.source = sys.intern(source)
+        self.duration_minutes = duration_minutes
+        self.views = views
+
+    @property
+    def type(self) -> str:
+        return 'video' if self.source == 'youtube' else 'article'
+
+    @property
+    def thumbnail(self) -> Optional[str]:
+        if self.source != 'youtube':
+            return None
+        return f"https://i.ytimg.com/vi/{self.link.rsplit('v=', 1)[-1]}/hqdefault.jpg"
+
+    @property
+    def duration_label(self) -> str:
+        if self.duration_minutes is None:
+            return ARTICLE_DURATION_LABEL if self.source != 'youtube' else '-'
+        return f"{self.duration_minutes} menit"
+
+    def to_row(self) -> List[Any]:
+        """JSON-friendly positional form used by persistent and shared caches"""
+        return [self.title, self.description, self.link, self.source, self.duration_minutes, self.views]
+
+    @classmethod
+    def decode(cls, value: Any) -> 'ContentItem':
+        """Rebuild an item from to_row() output, or from the dict format stored by older versions"""
+        if isinstance(value, dict):
+            source = value.get('source', 'web')
+            return cls(
+                value.get('title', ''),
+                value.get('description', ''),
+                value.get('link', ''),
+                source,
+                _first_int(value.get('duration')) if source == 'youtube' else None,
+                _first_int(value.get('views')) or 0
+            )
+        return cls(*value)
+
+    def __repr__(self) -> str:
+        return f"ContentItem({self.source}, {self.title!r}, {self.link})"
+
+
+def encode_items(items: List[ContentItem]) -> List[List[Any]]:
+    return [item.to_row() for item in items]
+
+
+def decode_items(rows: List[Any]) -> List[ContentItem]:
+    return [ContentItem.decode(row) for row in rows]
+
+
+def encode_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Encode a cache entry holding its items under 'items'"""
+    return dict(entry, items=encode_items(entry['items']))
+
+
+def decode_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(entry, items=decode_items(entry['items']))
+
+
+# (encode, decode) pairs for caches that persist to JSON or share state across workers
+ITEMS_CODEC = (encode_items, decode_items)
+ENTRY_CODEC = (encode_entry, decode_entry)
@@ -1,7 +1,49 @@
-from typing import Dict, List, Any
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Set, Tuple
+from dotenv import load_dotenv
 from agents.preference_agent import PreferenceAgent
 from agents.content_agent import ContentAgent
 from agents.recommendation_agent import RecommendationAgent
+from agents.cache import normalize_query, profile_key
+from agents.singleflight import SingleFlight
+from agents.shared_state import create_cache, create_singleflight
+from agents.metrics import metrics
+from agents.rate_limiter import QuotaExceeded, background_priority
+from agents.resilience import CircuitOpen
+from agents.content_item import ContentItem, ITEMS_CODEC, ENTRY_CODEC
+
+load_dotenv()
+CONTENT_CACHE_TTL = float(os.getenv('CONTENT_CACHE_TTL', '21600'))  # 6 hours
+CONTENT_CACHE_MAX_ENTRIES = int(os.getenv('CONTENT_CACHE_MAX_ENTRIES', '2000'))
+CONTENT_CACHE_FILE = os.getenv('CONTENT_CACHE_FILE', '')  # Empty disables persistence
+# How long past expiry cached results may still be served, while refreshing or when a source is down
+CONTENT_MAX_STALE = float(os.getenv('CONTENT_MAX_STALE', '86400'))  # 1 day
+MAX_RESULTS_PER_SOURCE = 5
+PAGE_SIZE = 5  # Recommendations per /recommend or /more reply
+# Pages a source may be read per /more when the pages it returns hold only items already shown
+MORE_MAX_PAGES = 3
+# How long /more can continue a user's last ranked list
+BROWSE_SESSION_TTL = float(os.getenv('BROWSE_SESSION_TTL', '86400'))
+# Per-source deadlines (seconds); a late source is skipped and the user gets partial results
+SOURCE_DEADLINES = {
+    'youtube': float(os.getenv('YOUTUBE_DEADLINE', '4')),
+    'web': float(os.getenv('SERP_DEADLINE', '4'))
+}
+# Precomputed per-user results: served directly while fresh, served and refreshed once stale
+RESULT_FRESH_SECONDS = float(os.getenv('RESULT_FRESH_SECONDS', '1800'))
+RESULT_MAX_AGE = float(os.getenv('RESULT_MAX_AGE', '86400'))
+ACTIVE_USER_WINDOW = float(os.getenv('ACTIVE_USER_WINDOW', '604800'))  # 7 days
+# Each of N worker processes runs its own prefetch job, so it gets 1/N of the daily budget like the API quotas
+PREFETCH_DAILY_BUDGET = int(
+    int(os.getenv('PREFETCH_DAILY_BUDGET', '500')) / max(1, int(os.getenv('RATE_LIMIT_WORKERS', '1')))
+)
+MAX_TRACKED_USERS = 10000
+
+# Receives an early, locally ranked list while the full pipeline is still running
+PartialCallback = Callable[[List[ContentItem]], Awaitable[None]]
 
 class AgentCoordinator:
     def __init__(
@@ -13,48 +55,506 @@ class AgentCoordinator:
         self.preference_agent = preference_agent
         self.content_agent = content_agent
         self.recommendation_agent = recommendation_agent
-        self.content_cache = {}  # Cache content search results
+        # Cache content search results per normalized query, shared by all users
+        self.content_cache = create_cache(
+            'content',
+            ttl=CONTENT_CACHE_TTL,
+            max_entries=CONTENT_CACHE_MAX_ENTRIES,
+            persist_path=CONTENT_CACHE_FILE or None,
+            codec=ITEMS_CODEC,
+            keep_stale=True  # Expired results are still served while they are refreshed
+        )
+        # Concurrent cache misses for the same query wait on one shared search
+        self.inflight = create_singleflight()
+        # Next-page cursor of each cached first page, so /more can continue from it:
+        # {'next': cursor}, where a None cursor marks the last page and a missing entry an unknown one
+        self.page_cursors = create_cache(
+            'page_cursors', ttl=CONTENT_CACHE_TTL, max_entries=CONTENT_CACHE_MAX_ENTRIES, keep_stale=True
+        )
+        # Per-user ranked candidate list and position for /more
+        self.sessions = create_cache(
+            'sessions', ttl=BROWSE_SESSION_TTL, max_entries=MAX_TRACKED_USERS, codec=ENTRY_CODEC
+        )
+        self.pages = SingleFlight()
+        # Warm results and the bookkeeping used to prefetch them
+        self.results = create_cache('results', ttl=RESULT_MAX_AGE, max_entries=MAX_TRACKED_USERS, codec=ENTRY_CODEC)
+        self.refreshes = SingleFlight()
+        self.recent_users = OrderedDict()  # user_id -> last activity, oldest first
+        self.pending_prefetch = OrderedDict()  # users who just changed their profile
+        self._background = set()
+        self._prefetch_day = None
+        self._prefetch_used = 0
+        self._register_metrics()
+
+    async def start(self) -> None:
+        """Open long-lived resources held by the agents"""
+        await self.content_agent.start()
+
+    async def close(self) -> None:
+        """Release long-lived resources held by the agents"""
+        for task in list(self._background):
+            task.cancel()
+        await self.content_agent.close()
+        await self.preference_agent.close()
+        await self.recommendation_agent.close()
+        await self.content_cache.close()
     
     async def set_user_preferences(self, user_id: int, preferences: Dict[str, Any]) -> None:
-        """Set user preferences and invalidate any cached content"""
+        """Set user preferences and drop the user's warm result"""
+        # Content, analysis and rankings are keyed on the profile, so a new profile simply maps to new keys
         await self.preference_agent.store_preferences(user_id, preferences)
-        # Invalidate cache for this user
-        if user_id in self.content_cache:
-            del self.content_cache[user_id]
+        await self.results.delete(user_id)
+        self.pending_prefetch[user_id] = time.time()
     
     async def has_preferences(self, user_id: int) -> bool:
         """Check if user has set preferences"""
         return await self.preference_agent.has_preferences(user_id)
     
-    async def get_recommendations(self, user_id: int) -> List[Dict[str, Any]]:
-        """Coordinate agents to get personalized recommendations"""
-        # Step 1: Get user preferences
+    def cache_stats(self) -> Dict[str, int]:
+        """Expose content cache hit/miss/eviction counters"""
+        return self.content_cache.stats()
+
+    def inflight_stats(self) -> Dict[str, Dict[str, int]]:
+        """Expose how many searches were executed versus coalesced onto an in-flight one"""
+        return {
+            'coordinator': self.inflight.stats(),
+            'content_agent': self.content_agent.inflight.stats()
+        }
+
+    def _register_metrics(self):
+        """Expose cache, coalescing and batching counters kept by the agents at scrape time"""
+        metrics.register_callback(
+            'content_cache', 'gauge', 'stat', self.content_cache.stats,
+            'Shared content cache counters (hits, misses, evictions, size)'
+        )
+        metrics.register_callback(
+            'analysis_cache', 'gauge', 'stat', self.preference_agent.analysis_cache.stats,
+            'Memoized Gemini preference analysis counters'
+        )
+        metrics.register_callback(
+            'ranking_cache', 'gauge', 'stat', self.recommendation_agent.ranking_cache.stats,
+            'Memoized Gemini ranking counters'
+        )
+        metrics.register_callback(
+            'search_coalescing', 'gauge', 'stat',
+            lambda: {f"{layer}_{k}": v for layer, stats in self.inflight_stats().items() for k, v in stats.items()},
+            'Searches executed versus coalesced onto an in-flight search'
+        )
+        metrics.register_callback(
+            'ranking_batches', 'gauge', 'stat', self.recommendation_agent.batcher.stats,
+            'Gemini ranking micro-batch counters and fill rate'
+        )
+
+    @staticmethod
+    def _cache_key(query: str, source: str, max_results: int) -> str:
+        return f"{source}:{max_results}:{query}"
+
+    async def _search_source(
+        self, source: str, query: str, max_results: int, topic: Optional[str] = None
+    ) -> List[ContentItem]:
+        """Search a single source through the shared content cache and the content catalog.
+
+        Cataloged items only stand in for a live search if they contain every token of topic.
+        """
+        key = self._cache_key(normalize_query(query), source, max_results)
+        cached = await self.content_cache.get(key)
+        metrics.inc('content_cache_lookups_total', source=source, result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+
+        # Stale-while-revalidate: serve expired results now and refresh them in the background
+        stale = await self.content_cache.get_stale(key, CONTENT_MAX_STALE)
+        if stale:
+            metrics.inc('content_cache_stale_served_total', source=source)
+            self._schedule_source_refresh(key, source, query, max_results)
+            return stale
+
+        # Items fetched earlier for similar queries may already cover this one
+        cataloged = await self._search_catalog(source, query, max_results, topic)
+        if len(cataloged) >= max_results:
+            await self.content_cache.set(key, cataloged)
+            return cataloged
+
+        try:
+            results = await self.inflight.do(
+                key,
+                lambda: self._fetch_source(key, source, query, max_results),
+                lookup=lambda: self.content_cache.get(key)
+            )
+        except Exception:
+            if cataloged:
+                return cataloged  # The source failed; the catalog's partial match beats nothing
+            raise
+        # The live API only fills the gaps the catalog left
+        links = {item.link for item in results}
+        gaps = [item for item in cataloged if item.link not in links]
+        return results + gaps[:max(0, max_results - len(results))]
+
+    async def _search_catalog(
+        self, source: str, query: str, max_results: int, topic: Optional[str] = None
+    ) -> List[ContentItem]:
+        catalog = self.content_agent.catalog
+        if catalog is None:
+            return []
+        try:
+            items = await catalog.search(source, query, max_results, required=topic)
+        except Exception as e:
+            print(f"Error searching the content catalog: {e}")
+            return []
+        metrics.inc('catalog_lookups_total', source=source, result='hit' if len(items) >= max_results else 'miss')
+        return items
+
+    async def _fetch_source(self, key: str, source: str, query: str, max_results: int) -> List[ContentItem]:
+        """Search a source and store its results, even an empty answer, in the content cache"""
+        try:
+            if source == 'youtube':
+                results, cursor = await self.content_agent.search_youtube_page(query, max_results)
+            else:
+                results, cursor = await self.content_agent.search_articles_page(query, max_results)
+        except (QuotaExceeded, CircuitOpen) as e:
+            # Out of budget or upstream degraded: serve expired cached results if we still hold them
+            stale = await self.content_cache.get_stale(key, CONTENT_MAX_STALE)
+            if stale is None:
+                raise
+            print(f"{e}; serving cached results for query: {query}")
+            return stale
+
+        # Failed searches raise before this point, so the next request retries them
+        await self.content_cache.set(key, results)
+        await self.page_cursors.set(key, {'next': cursor})
+        return results
+
+    async def _search_with_deadline(
+        self, source: str, query: str, max_results: int, topic: Optional[str] = None
+    ) -> Optional[List[ContentItem]]:
+        """Search a source, giving up after its deadline without cancelling the search.
+
+        Returns None when the source missed its deadline or failed, so an empty answer stays distinguishable.
+        """
+        # The search is shielded so a late result still lands in the cache for the next request
+        task = asyncio.ensure_future(self._search_source(source, query, max_results, topic))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # Don't warn about late failures
+        try:
+            with metrics.span(f"coordinator.search.{source}"):
+                return await asyncio.wait_for(asyncio.shield(task), timeout=SOURCE_DEADLINES[source])
+        except asyncio.TimeoutError:
+            metrics.inc('source_deadline_misses_total', source=source)
+            print(f"Source {source} missed its {SOURCE_DEADLINES[source]}s deadline for query: {query}")
+            return None
+        except Exception as e:
+            print(f"Source {source} failed for query {query}: {e}")
+            return None
+
+    async def get_recommendations(
+        self, user_id: int, on_partial: Optional[PartialCallback] = None
+    ) -> List[ContentItem]:
+        """Coordinate agents to get personalized recommendations.
+
+        When on_partial is given and nothing is precomputed, it is awaited with the
+        first source's results (ranked locally) before the final list is returned.
+        """
+        self._mark_active(user_id)
+        with metrics.request('recommend', user_id=user_id):
+            # Step 1: Get user preferences
+            with metrics.span('coordinator.preferences'):
+                preferences = await self.preference_agent.get_preferences(user_id)
+            if not preferences:
+                return []
+
+            # Serve a precomputed result when there is one; refresh it in the background once stale
+            warm = await self._warm_result(user_id, preferences)
+            if warm is not None:
+                recommendations, fresh = warm
+                metrics.inc('warm_results_total', state='fresh' if fresh else 'stale')
+                if not fresh:
+                    self._schedule_refresh(user_id)
+            else:
+                metrics.inc('warm_results_total', state='cold')
+                recommendations = await self.refresh_recommendations(user_id, on_partial)
+
+            # /more continues from the rest of this ranked list
+            await self._start_session(user_id, preferences, recommendations, PAGE_SIZE)
+
+            # Return top recommendations (max 5)
+            return recommendations[:PAGE_SIZE]
+
+    async def refresh_recommendations(
+        self, user_id: int, on_partial: Optional[PartialCallback] = None
+    ) -> List[ContentItem]:
+        """Recompute and store the full ranked list for a user; concurrent refreshes are coalesced"""
+        return await self.refreshes.do(user_id, lambda: self._refresh(user_id, on_partial))
+
+    async def _refresh(self, user_id: int, on_partial: Optional[PartialCallback] = None) -> List[ContentItem]:
         preferences = await self.preference_agent.get_preferences(user_id)
         if not preferences:
             return []
+        recommendations, complete = await self._recommend(user_id, preferences, on_partial)
+        if recommendations:
+            # A partial result (a source missed its deadline) is stored as already stale
+            await self.results.set(user_id, {
+                'profile': profile_key(preferences),
+                'computed_at': time.time() if complete else 0.0,
+                'items': recommendations
+            })
+        return recommendations
         
-        # Step 2: Analyze preferences using Gemini AI
-        preference_analysis = await self.preference_agent.analyze_preferences(user_id)
+    async def _recommend(
+        self, user_id: int, preferences: Dict[str, Any], on_partial: Optional[PartialCallback] = None
+    ) -> Tuple[List[ContentItem], bool]:
+        """Run the pipeline; returns the full ranked list and whether every source answered.
+
+        A source that answered with no items counts as answered; only deadline misses and failures don't.
+        """
+        # Step 2: Analyze preferences with Gemini AI while searching every source concurrently
+        query = f"{preferences['topic']} {preferences['field']}"
+        analysis_task = asyncio.ensure_future(self.preference_agent.analyze_preferences(user_id))
+        searches = [
+            asyncio.ensure_future(
+                self._search_with_deadline(source, query, MAX_RESULTS_PER_SOURCE, topic=preferences['topic'])
+            )
+            for source in ('youtube', 'web')
+        ]
+        partial = None
+        if on_partial is not None:
+            partial = await self._send_partial(analysis_task, searches, preferences, on_partial)
+        try:
+            preference_analysis, videos, articles = await asyncio.gather(analysis_task, *searches)
+        finally:
+            if partial is not None:
+                # The final list must not overtake the partial one on its way to the user
+                await partial
+        complete = videos is not None and articles is not None
+        all_content = (videos or []) + (articles or [])
         
-        # Step 3: Check cache or search for content
-        if user_id not in self.content_cache:
-            # Build search query combining field and topic
-            query = f"{preferences['topic']} {preferences['field']}"
+        # Step 3: Filter and rank content
+        with metrics.span('coordinator.rank'):
+            recommendations = await self.recommendation_agent.filter_and_rank(
+                all_content, preferences, preference_analysis
+            )
+        return recommendations, complete
             
-            # Search for content from different sources
-            videos = await self.content_agent.search_youtube_videos(query)
-            articles = await self.content_agent.search_articles(query)
+    async def _send_partial(
+        self,
+        analysis_task: asyncio.Future,
+        searches: List[asyncio.Future],
+        preferences: Dict[str, Any],
+        on_partial: PartialCallback
+    ) -> Optional[asyncio.Future]:
+        """Hand the content found so far (often cache hits) to on_partial while the final ranking is pending"""
+        for next_done in asyncio.as_completed(searches):
+            items = await next_done
+            if not items:
+                continue
+            if analysis_task.done() and all(search.done() for search in searches):
+                return None  # Only the local ranking is left; the final list follows right away
+            ready = [item for search in searches if search.done() for item in search.result() or []]
+            partial = self.recommendation_agent.quick_rank(ready, preferences)[:5]
+            if not partial:
+                return None
             
-            # Combine results
-            all_content = videos + articles
-            self.content_cache[user_id] = all_content
+            async def deliver():
+                try:
+                    await on_partial(partial)
+                except Exception as e:
+                    print(f"Error delivering partial recommendations: {e}")
+            return asyncio.ensure_future(deliver())
+        return None
+
+    async def _start_session(
+        self, user_id: int, preferences: Dict[str, Any], ranked: List[ContentItem], served: int
+    ) -> Dict[str, Any]:
+        session = {
+            'profile': profile_key(preferences),
+            'items': ranked,
+            'served': min(served, len(ranked)),
+            'cursors': {}  # source -> next page cursor; absent until a further page is fetched
+        }
+        await self.sessions.set(user_id, session)
+        return session
+
+    async def more_recommendations(self, user_id: int) -> Tuple[List[ContentItem], int]:
+        """Serve the next page of the user's ranked list; returns the page and its 1-based position.
+
+        Once the list runs out, the next page of every source is fetched and only
+        the new candidates (plus any not yet served) are ranked.
+        """
+        self._mark_active(user_id)
+        with metrics.request('more', user_id=user_id):
+            preferences = await self.preference_agent.get_preferences(user_id)
+            if not preferences:
+                return [], 0
+            # Concurrent /more from one user must not serve the same page twice
+            return await self.pages.do(user_id, lambda: self._next_page(user_id, preferences))
+
+    async def _next_page(self, user_id: int, preferences: Dict[str, Any]) -> Tuple[List[ContentItem], int]:
+        session = await self.sessions.get(user_id)
+        if session is None or session['profile'] != profile_key(preferences):
+            # Nothing to continue from: start with the user's current list
+            warm = await self._warm_result(user_id, preferences)
+            ranked = warm[0] if warm is not None else await self.refresh_recommendations(user_id)
+            session = await self._start_session(user_id, preferences, ranked, 0)
+
+        served = session['served']
+        if served + PAGE_SIZE > len(session['items']):
+            with metrics.span('coordinator.more.extend'):
+                await self._extend_session(user_id, preferences, session)
+
+        page = session['items'][served:served + PAGE_SIZE]
+        session['served'] = served + len(page)
+        await self.sessions.set(user_id, session)
+        return page, served + 1
+
+    async def _extend_session(self, user_id: int, preferences: Dict[str, Any], session: Dict[str, Any]) -> None:
+        """Fetch the next page of every source and rank it together with the unserved rest of the list"""
+        query = f"{preferences['topic']} {preferences['field']}"
+        seen = {item.link for item in session['items']}
+        pages = await asyncio.gather(*(
+            self._fetch_next_page(source, query, session['cursors'], seen) for source in ('youtube', 'web')
+        ))
+        fresh = []
+        for item in (item for page in pages for item in page):
+            if item.link not in seen:
+                seen.add(item.link)
+                fresh.append(item)
+        if not fresh:
+            return
+
+        analysis = await self.preference_agent.analyze_preferences(user_id)
+        unserved = session['items'][session['served']:]
+        with metrics.span('coordinator.more.rank'):
+            ranked = await self.recommendation_agent.filter_and_rank(unserved + fresh, preferences, analysis)
+        session['items'] = session['items'][:session['served']] + ranked
+
+    async def _fetch_next_page(
+        self, source: str, query: str, cursors: Dict[str, Any], seen: Set[str]
+    ) -> List[ContentItem]:
+        """Fetch items past cursors[source] that aren't in seen, and advance the cursor.
+
+        The first page's cursor comes from page_cursors. When it is unknown (the cached page
+        came from the catalog, or its cursor was evicted) YouTube restarts at page 1 and pages
+        holding only seen items are skipped, up to MORE_MAX_PAGES pages.
+        """
+        if source in cursors:
+            exhausted, cursor = cursors[source] is None, cursors[source]
         else:
-            all_content = self.content_cache[user_id]
-        
-        # Step 4: Filter and rank content
-        recommendations = await self.recommendation_agent.filter_and_rank(
-            all_content, preferences, preference_analysis
-        )
+            key = self._cache_key(normalize_query(query), source, MAX_RESULTS_PER_SOURCE)
+            known = await self.page_cursors.get_stale(key)
+            if isinstance(known, dict):
+                exhausted, cursor = known['next'] is None, known['next']
+            else:
+                # SerpAPI offsets don't depend on a previous response; YouTube starts over at page 1
+                exhausted, cursor = False, MAX_RESULTS_PER_SOURCE if source == 'web' else None
+        if exhausted:
+            cursors[source] = None
+            return []  # The source has no further pages
         
-        # Return top recommendations (max 5)
-        return recommendations[:5]
\ No newline at end of file
+        fresh = []
+        for _ in range(MORE_MAX_PAGES):
+            try:
+                with metrics.span(f"coordinator.more.{source}"):
+                    if source == 'youtube':
+                        search = self.content_agent.search_youtube_page(query, MAX_RESULTS_PER_SOURCE, cursor)
+                    else:
+                        search = self.content_agent.search_articles_page(query, MAX_RESULTS_PER_SOURCE, cursor)
+                    results, cursor = await asyncio.wait_for(search, timeout=SOURCE_DEADLINES[source])
+            except asyncio.TimeoutError:
+                metrics.inc('source_deadline_misses_total', source=source)
+                print(f"Source {source} missed its {SOURCE_DEADLINES[source]}s deadline for the next page of: {query}")
+                break
+            except Exception as e:
+                print(f"Source {source} failed for the next page of {query}: {e}")
+                break
+            
+            cursors[source] = cursor
+            fresh = [item for item in results if item.link not in seen]
+            if fresh or cursor is None:
+                break
+        return fresh
+
+    async def _warm_result(self, user_id: int, preferences: Dict[str, Any]) -> Optional[Tuple[List[ContentItem], bool]]:
+        """Return (items, is_fresh) for a stored result matching the current profile"""
+        entry = await self.results.get(user_id)
+        if entry is None or entry['profile'] != profile_key(preferences):
+            return None
+        return entry['items'], time.time() - entry['computed_at'] < RESULT_FRESH_SECONDS
+
+    def _mark_active(self, user_id: int):
+        self.recent_users[user_id] = time.time()
+        self.recent_users.move_to_end(user_id)
+        while len(self.recent_users) > MAX_TRACKED_USERS:
+            self.recent_users.popitem(last=False)
+
+    def _schedule_source_refresh(self, key: str, source: str, query: str, max_results: int):
+        """Refetch an expired content cache entry without making the current request wait"""
+        async def run():
+            try:
+                with background_priority():
+                    await self.inflight.do(
+                        key,
+                        lambda: self._fetch_source(key, source, query, max_results),
+                        lookup=lambda: self.content_cache.get(key)
+                    )
+            except Exception as e:
+                print(f"Error refreshing cached {source} results for query {query}: {e}")
+        task = asyncio.ensure_future(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _schedule_refresh(self, user_id: int):
+        """Refresh a stale result without making the current request wait"""
+        async def run():
+            with background_priority(), metrics.request('refresh', user_id=user_id):
+                await self.refresh_recommendations(user_id)
+        task = asyncio.ensure_future(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _prefetch_allowance(self, wanted: int) -> int:
+        """Clamp a number of background refreshes to what is left of today's budget"""
+        today = time.strftime('%Y-%m-%d')
+        if self._prefetch_day != today:
+            self._prefetch_day, self._prefetch_used = today, 0
+        return max(0, min(wanted, PREFETCH_DAILY_BUDGET - self._prefetch_used))
+
+    async def _prefetch_due(self, user_id: int, now: float) -> bool:
+        entry = await self.results.get(user_id)
+        # Refresh a little before the result turns stale so the next request stays warm
+        return entry is None or now - entry['computed_at'] > RESULT_FRESH_SECONDS * 0.75
+
+    async def prefetch(self, max_refreshes: int) -> int:
+        """Precompute results for just-profiled and recently active users; returns refreshes done"""
+        budget = self._prefetch_allowance(max_refreshes)
+        now = time.time()
+        candidates = []
+        # Users without a profile have nothing to prefetch and are not charged to the budget
+        while self.pending_prefetch and len(candidates) < budget:
+            user_id = self.pending_prefetch.popitem(last=False)[0]
+            if await self.preference_agent.has_preferences(user_id):
+                candidates.append(user_id)
+
+        # Most recently active users first
+        for user_id, last_active in reversed(list(self.recent_users.items())):
+            if len(candidates) >= budget or now - last_active > ACTIVE_USER_WINDOW:
+                break
+            if (user_id not in candidates and await self._prefetch_due(user_id, now)
+                    and await self.preference_agent.has_preferences(user_id)):
+                candidates.append(user_id)
+
+        for user_id in candidates:
+            self._prefetch_used += 1
+            try:
+                with background_priority(), metrics.request('prefetch', user_id=user_id):
+                    await self.refresh_recommendations(user_id)
+            except Exception as e:
+                print(f"Error prefetching recommendations for user {user_id}: {e}")
+        return len(candidates)
+
+    async def prefetch_user(self, user_id: int) -> bool:
+        """Precompute one user's result right away, e.g. just after /setprofile"""
+        if not self._prefetch_allowance(1) or not await self.preference_agent.has_preferences(user_id):
+            return False
+        self.pending_prefetch.pop(user_id, None)
+        self._prefetch_used += 1
+        with background_priority(), metrics.request('prefetch', user_id=user_id):
+            await self.refresh_recommendations(user_id)
+        return True
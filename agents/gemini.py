@@ -0,0 +1,58 @@
+import os
+import asyncio
+from typing import Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+
+_module = None
+_loading: Optional[asyncio.Future] = None
+
+
+def _genai():
+    """Import and configure the Gemini SDK once"""
+    global _module
+    if _module is None:
+        import google.generativeai as genai  # Slow to import; kept off the startup path
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        _module = genai
+    return _module
+
+
+async def load_genai():
+    """Return the SDK, importing it on a worker thread so the event loop keeps serving updates"""
+    global _loading
+    if _module is not None:
+        return _module
+    if _loading is None:
+        _loading = asyncio.ensure_future(asyncio.to_thread(_genai))
+    try:
+        return await asyncio.shield(_loading)
+    except Exception:
+        _loading = None  # Let the next call retry a failed import
+        raise
+
+
+async def warm_up() -> None:
+    """Load the SDK ahead of the first model call, e.g. right after startup"""
+    try:
+        await load_genai()
+    except Exception as e:
+        print(f"Error loading the Gemini SDK: {e}")
+
+
+class LazyGeminiModel:
+    """Stands in for genai.GenerativeModel and builds it on first use"""
+
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        self.model_name = model_name
+        self._model = None
+
+    async def _load(self) -> Any:
+        if self._model is None:
+            self._model = (await load_genai()).GenerativeModel(self.model_name)
+        return self._model
+
+    async def generate_content_async(self, *args, **kwargs) -> Any:
+        return await (await self._load()).generate_content_async(*args, **kwargs)
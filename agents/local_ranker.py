@@ -0,0 +1,71 @@
+import re
+from typing import Any, Dict, List
+import numpy as np
+from agents.content_item import ContentItem
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Query term weights: the topic matters most, subtopics from the analysis least
+TOPIC_WEIGHT = 2.0
+FIELD_WEIGHT = 1.0
+SUBTOPIC_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, ignoring single characters"""
+    return [t for t in TOKEN_RE.findall((text or '').lower()) if len(t) > 1]
+
+
+class LocalRanker:
+    """In-process BM25 ranker over title and description, scored in one NumPy batch"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, title_boost: int = 2):
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+
+    def _query_weights(self, preferences: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, float]:
+        weights = {}
+        for text, weight in [(preferences.get('topic', ''), TOPIC_WEIGHT), (preferences.get('field', ''), FIELD_WEIGHT)]:
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        for subtopic in analysis.get('subtopics', []) or []:
+            for token in tokenize(str(subtopic)):
+                weights.setdefault(token, SUBTOPIC_WEIGHT)
+        return weights
+
+    def score(self, content: List[ContentItem], preferences: Dict[str, Any], analysis: Dict[str, Any]) -> np.ndarray:
+        """Return one BM25 score per content item"""
+        weights = self._query_weights(preferences, analysis)
+        if not content or not weights:
+            return np.zeros(len(content))
+
+        terms = list(weights)
+        term_index = {t: i for i, t in enumerate(terms)}
+        tf = np.zeros((len(content), len(terms)))
+        doc_len = np.zeros(len(content))
+
+        for row, item in enumerate(content):
+            # Title tokens count several times so a matching title outweighs a long description
+            tokens = tokenize(item.title) * self.title_boost + tokenize(item.description)
+            doc_len[row] = len(tokens)
+            for token in tokens:
+                col = term_index.get(token)
+                if col is not None:
+                    tf[row, col] += 1
+
+        n_docs = len(content)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        avg_len = doc_len.mean() or 1.0
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+        bm25 = tf * (self.k1 + 1) / (tf + norm[:, None])
+        return bm25 @ (idf * np.array([weights[t] for t in terms]))
+
+    def rank(self, content: List[ContentItem], preferences: Dict[str, Any], analysis: Dict[str, Any]) -> List[ContentItem]:
+        """Return the content items sorted by relevance"""
+        if not content:
+            return []
+        scores = self.score(content, preferences, analysis)
+        # Stable sort keeps the source order for ties
+        return [content[idx] for idx in np.argsort(-scores, kind='stable')]
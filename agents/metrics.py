@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+REQUEST_LOG = os.getenv('REQUEST_LOG', 'false').lower() == 'true'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage timings and call counts of the request currently being served
+_request_context: contextvars.ContextVar = contextvars.ContextVar('request_context', default=None)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    """Counters, latency histograms and timing spans, rendered in Prometheus text format"""
+
+    def __init__(self, enabled: bool = True, request_log: bool = False):
+        self.enabled = enabled
+        self.request_log = request_log
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._callbacks: Dict[str, Tuple[str, str, Callable[[], Dict[str, float]]]] = {}
+        self._help: Dict[str, str] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Increment a counter"""
+        if not self.enabled:
+            return
+        series = self._counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+        ctx = _request_context.get()
+        if ctx is not None and name == 'external_calls_total':
+            api = labels.get('api', 'unknown')
+            ctx['external_calls'][api] = ctx['external_calls'].get(api, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record a latency observation (seconds) in a histogram"""
+        if not self.enabled:
+            return
+        series = self._histograms.setdefault(name, {})
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = _Histogram()
+        histogram.observe(value)
+
+    def register_callback(
+        self, name: str, kind: str, label: str, fn: Callable[[], Dict[str, float]], help_text: str = ''
+    ) -> None:
+        """Expose values computed at scrape time, e.g. cache counters kept elsewhere.
+
+        fn returns a mapping of label value to number.
+        """
+        self._callbacks[name] = (kind, label, fn)
+        if help_text:
+            self._help[name] = help_text
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time a stage into stage_duration_seconds and count its failures"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc('stage_failures_total', stage=stage)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe('stage_duration_seconds', elapsed, stage=stage)
+            ctx = _request_context.get()
+            if ctx is not None:
+                ctx['stages'][stage] = round(ctx['stages'].get(stage, 0) + elapsed * 1000, 2)
+
+    def timed(self, stage: str) -> Callable:
+        """Decorate an async method with a span; a no-op when metrics are disabled"""
+        def decorator(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def request(self, kind: str, **fields):
+        """Track one user request and emit a structured log line when it finishes"""
+        if not self.enabled:
+            yield None
+            return
+        ctx = {'stages': {}, 'external_calls': {}}
+        token = _request_context.set(ctx)
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield ctx
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            _request_context.reset(token)
+            elapsed = time.perf_counter() - started
+            self.observe('request_duration_seconds', elapsed, kind=kind)
+            self.inc('requests_total', kind=kind, status=status)
+            if self.request_log:
+                print(json.dumps({
+                    'event': kind,
+                    'status': status,
+                    'total_ms': round(elapsed * 1000, 2),
+                    **fields,
+                    **ctx
+                }, default=str))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, series in sorted(self._counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+        for name, series in sorted(self._histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': f'{bound:g}'})} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        for name, (kind, label_name, fn) in sorted(self._callbacks.items()):
+            try:
+                values = fn()
+            except Exception as e:
+                print(f"Error collecting metric {name}: {e}")
+                continue
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label, value in values.items():
+                lines.append(f"{name}{_format_labels(_label_key({label_name: label}))} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(enabled=METRICS_ENABLED, request_log=REQUEST_LOG)
+
+
+async def start_metrics_server(port: int, host: str = '0.0.0.0'):
+    """Serve metrics.render() on /metrics; returns the aiohttp runner for cleanup"""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
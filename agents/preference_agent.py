@@ -1,63 +1,91 @@
 import os
 import json
+import asyncio
 from typing import Dict, Any
-import google.generativeai as genai
 from dotenv import load_dotenv
+from agents.cache import DATA_DIR, TTLCache, profile_key
+from agents.shared_state import SHARED_STATE_DB, create_cache
+from agents.preference_store import create_preference_store
+from agents.metrics import metrics
+from agents.gemini import LazyGeminiModel
+from agents.rate_limiter import rate_limiter
+from agents.resilience import circuit_breakers
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+PREFERENCE_STORE = os.getenv('PREFERENCE_STORE', 'sqlite')  # 'sqlite' or 'json'
+# Another worker may update a profile, so shared deployments read through to the store
+PREFERENCE_CACHE_TTL = float(os.getenv('PREFERENCE_CACHE_TTL', '0' if SHARED_STATE_DB else '300'))
+ANALYSIS_CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', '604800'))  # 7 days
+ANALYSIS_CACHE_FILE = os.getenv('ANALYSIS_CACHE_FILE', '')  # Empty disables persistence
+# Recommendations wait at most this long for Gemini's analysis before using the default one
+ANALYSIS_LLM_BUDGET = float(os.getenv('ANALYSIS_LLM_BUDGET', '2.5'))
+
+
+def default_analysis() -> Dict[str, Any]:
+    """Analysis used when Gemini is unavailable, slow or returns no JSON"""
+    return {
+        "subtopics": [],
+        "formats": ["video", "article"],
+        "complexity": "beginner"
+    }
 
 class PreferenceAgent:
     def __init__(self):
-        self.user_preferences = {}
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-        self.data_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'user_data.json')
-        
-        # Create data directory if it doesn't exist
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        
-        # Load existing user data if available
-        self._load_user_data()
+        # Read-through cache of profiles; the store is the source of truth
+        self.user_preferences = TTLCache(ttl=PREFERENCE_CACHE_TTL, max_entries=10000)
+        self.model = LazyGeminiModel()
+        self.store = create_preference_store(PREFERENCE_STORE, DATA_DIR)
+        # Memoized Gemini analyses keyed on the normalized profile, shared by all users
+        self.analysis_cache = create_cache(
+            'analysis',
+            ttl=ANALYSIS_CACHE_TTL,
+            max_entries=5000,
+            persist_path=ANALYSIS_CACHE_FILE or None
+        )
     
-    def _load_user_data(self):
-        """Load user preferences from JSON file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Convert user_id keys from strings back to integers
-                    self.user_preferences = {int(k): v for k, v in data.items()}
-            except Exception as e:
-                print(f"Error loading user data: {e}")
-                self.user_preferences = {}
+    async def close(self) -> None:
+        """Close the preference store and write out the analysis cache"""
+        await self.store.close()
+        await self.analysis_cache.close()
     
-    def _save_user_data(self):
-        """Save user preferences to JSON file"""
+    async def store_preferences(self, user_id: int, preferences: Dict[str, Any]) -> None:
+        """Store user preferences in the preference store"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.user_preferences, f, indent=2)
+            await self.store.put(user_id, preferences)
         except Exception as e:
             print(f"Error saving user data: {e}")
-    
-    async def store_preferences(self, user_id: int, preferences: Dict[str, Any]) -> None:
-        """Store user preferences and save to file"""
-        self.user_preferences[user_id] = preferences
-        self._save_user_data()
+        self.user_preferences.set(user_id, preferences)
     
     async def get_preferences(self, user_id: int) -> Dict[str, Any]:
-        """Get user preferences"""
-        return self.user_preferences.get(user_id, {})
+        """Get user preferences, loading them lazily from the store"""
+        preferences = self.user_preferences.get(user_id)
+        if preferences is None:
+            try:
+                preferences = await self.store.get(user_id)
+            except Exception as e:
+                print(f"Error loading user data: {e}")
+                preferences = None
+            if not preferences:
+                return {}
+            self.user_preferences.set(user_id, preferences)
+        return preferences
     
     async def has_preferences(self, user_id: int) -> bool:
         """Check if user has preferences"""
-        return user_id in self.user_preferences
+        return bool(await self.get_preferences(user_id))
     
+    @metrics.timed('preference.analyze')
     async def analyze_preferences(self, user_id: int) -> Dict[str, Any]:
         """Analyze user preferences using Gemini AI to extract more detailed interests"""
         preferences = await self.get_preferences(user_id)
         if not preferences:
             return {}
         
+        key = profile_key(preferences)
+        cached = await self.analysis_cache.get(key)
+        if cached is not None:
+            return cached
+        
         prompt = f"""
         As a learning content recommendation system, analyze these user preferences:
         - Field of study: {preferences.get('field')}
@@ -73,7 +101,16 @@ class PreferenceAgent:
         """
         
         try:
-            response = await self.model.generate_content_async(prompt)
+            # An open circuit or an exhausted Gemini budget falls back to the default analysis
+            breaker = circuit_breakers['gemini']
+            breaker.check()
+            await rate_limiter.acquire('gemini', 'generate')
+            metrics.inc('external_calls_total', api='gemini', call='analyze')
+            with breaker.track():
+                # A timeout counts as a failed call, so a degraded Gemini trips the breaker
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt), timeout=ANALYSIS_LLM_BUDGET
+                )
             response_text = response.text
             
             # Extract JSON from response
@@ -83,17 +120,15 @@ class PreferenceAgent:
             if start_idx >= 0 and end_idx > start_idx:
                 json_str = response_text[start_idx:end_idx]
                 analysis = json.loads(json_str)
+                await self.analysis_cache.set(key, analysis)
                 return analysis
             else:
-                return {
-                    "subtopics": [],
-                    "formats": ["video", "article"],
-                    "complexity": "beginner"
-                }
+                return default_analysis()
+        except asyncio.TimeoutError:
+            metrics.inc('analysis_llm_timeouts_total')
+            print(f"Gemini analysis missed its {ANALYSIS_LLM_BUDGET}s budget, using the default analysis")
+            return default_analysis()
         except Exception as e:
+            metrics.inc('external_call_failures_total', api='gemini', call='analyze')
             print(f"Error analyzing preferences: {e}")
-            return {
-                "subtopics": [],
-                "formats": ["video", "article"],
-                "complexity": "beginner"
-            }
\ No newline at end of file
+            return default_analysis()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class PreferenceStore(ABC):
+    """Storage backend interface for user preferences"""
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Return the stored preferences of a user, or None"""
+
+    @abstractmethod
+    async def put(self, user_id: int, preferences: Dict[str, Any]) -> None:
+        """Store or replace the preferences of a user"""
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLitePreferenceStore(PreferenceStore):
+    """SQLite store in WAL mode with per-user upserts, run on a dedicated thread"""
+
+    def __init__(self, db_path: str, legacy_json_path: Optional[str] = None):
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self._conn = None
+        # One worker keeps every sqlite call on the same thread and off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='preference-store')
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS preferences ("
+                "user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.commit()
+            self._conn = conn
+            self._migrate_from_json()
+        return self._conn
+
+    def _migrate_from_json(self):
+        """Import the legacy user_data.json once"""
+        conn = self._conn
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        try:
+            with open(self.legacy_json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            # Rows written after the migration must win, so never overwrite existing users
+            conn.executemany(
+                "INSERT OR IGNORE INTO preferences (user_id, data, updated_at) VALUES (?, ?, ?)",
+                [(int(k), json.dumps(v), now) for k, v in data.items()]
+            )
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)",
+                (self.legacy_json_path,)
+            )
+            conn.commit()
+            print(f"Migrated {len(data)} users from {self.legacy_json_path}")
+        except Exception as e:
+            conn.rollback()
+            print(f"Error migrating user data from JSON: {e}")
+
+    def _get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT data FROM preferences WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, user_id: int, preferences: Dict[str, Any]) -> None:
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO preferences (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, json.dumps(preferences), time.time())
+        )
+        conn.commit()
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get, user_id)
+
+    async def put(self, user_id: int, preferences: Dict[str, Any]) -> None:
+        await self._run(self._put, user_id, preferences)
+
+    async def close(self) -> None:
+        await self._run(self._close)
+
+
+class JSONPreferenceStore(PreferenceStore):
+    """Legacy single-file JSON store, rewritten atomically off the event loop"""
+
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+        self._data = None
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> Dict[int, Dict[str, Any]]:
+        if self._data is None:
+            self._data = {}
+            if os.path.exists(self.json_path):
+                try:
+                    with open(self.json_path, 'r', encoding='utf-8') as f:
+                        # Convert user_id keys from strings back to integers
+                        self._data = {int(k): v for k, v in json.load(f).items()}
+                except Exception as e:
+                    print(f"Error loading user data: {e}")
+        return self._data
+
+    def _save(self, snapshot: Dict[int, Dict[str, Any]]):
+        os.makedirs(os.path.dirname(self.json_path) or '.', exist_ok=True)
+        tmp_path = self.json_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, self.json_path)
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return self._load().get(user_id)
+
+    async def put(self, user_id: int, preferences: Dict[str, Any]) -> None:
+        async with self._lock:
+            data = self._load()
+            data[user_id] = preferences
+            await asyncio.get_running_loop().run_in_executor(None, self._save, dict(data))
+
+
+def create_preference_store(backend: str, data_dir: str) -> PreferenceStore:
+    """Build the configured preference store ('sqlite' or 'json')"""
+    json_path = os.path.join(data_dir, 'user_data.json')
+    if backend == 'json':
+        return JSONPreferenceStore(json_path)
+    if backend == 'sqlite':
+        return SQLitePreferenceStore(os.path.join(data_dir, 'user_data.db'), legacy_json_path=json_path)
+    raise ValueError(f"Unknown preference store backend: {backend}")
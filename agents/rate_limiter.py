@@ -0,0 +1,173 @@
+import os
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from agents.metrics import metrics
+
+load_dotenv()
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# Priority of the work running in the current task; background jobs switch it with background_priority()
+_priority: contextvars.ContextVar = contextvars.ContextVar('request_priority', default=INTERACTIVE)
+
+# Units charged per call type
+CALL_COSTS = {
+    ('youtube', 'search'): 100,
+    ('youtube', 'videos'): 1,
+    ('serp', 'search'): 1,
+    ('gemini', 'generate'): 1
+}
+
+
+class QuotaExceeded(Exception):
+    """Raised when an external API budget has no units left for the caller's priority"""
+
+    def __init__(self, api: str, priority: str):
+        super().__init__(f"{api} quota exhausted for {priority} work")
+        self.api = api
+        self.priority = priority
+
+
+@contextmanager
+def background_priority():
+    """Run the enclosed work as background: it may not dip into the interactive reserve"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class SharedPriority:
+    """Priority of work done for several callers: interactive as soon as any of them is.
+
+    Created by the caller that starts the work; callers that later wait on it join().
+    """
+
+    def __init__(self):
+        self._callers = [_priority.get()]
+
+    def join(self) -> None:
+        """Add the current caller; an interactive one promotes the work still in progress"""
+        if self.resolve() != INTERACTIVE:
+            self._callers.append(_priority.get())
+
+    def resolve(self) -> str:
+        priorities = (c.resolve() if isinstance(c, SharedPriority) else c for c in self._callers)
+        return INTERACTIVE if INTERACTIVE in priorities else BACKGROUND
+
+
+@contextmanager
+def shared_priority(priority: SharedPriority):
+    """Run the enclosed work at the priority of every caller waiting on it"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    priority = _priority.get()
+    return priority.resolve() if isinstance(priority, SharedPriority) else priority
+
+
+class TokenBucket:
+    """Token bucket where background work can only spend units above a reserved share"""
+
+    def __init__(self, capacity: float, refill_per_second: float, background_reserve: float = 0.3):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.background_reserve = background_reserve
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def _floor(self, priority: str) -> float:
+        return self.capacity * self.background_reserve if priority == BACKGROUND else 0.0
+
+    def try_acquire(self, units: float, priority: str) -> bool:
+        self._refill()
+        if self.tokens - units < self._floor(priority):
+            return False
+        self.tokens -= units
+        return True
+
+    def wait_time(self, units: float, priority: str) -> float:
+        """Seconds until units would be available for this priority"""
+        self._refill()
+        deficit = units + self._floor(priority) - self.tokens
+        if deficit <= 0:
+            return 0.0
+        if self.refill_per_second <= 0 or units + self._floor(priority) > self.capacity:
+            return float('inf')
+        return deficit / self.refill_per_second
+
+
+class RateLimiter:
+    """Per-API token buckets with unit costs per call type and interactive-over-background priority"""
+
+    def __init__(self, buckets: Dict[str, TokenBucket], interactive_max_wait: float = 1.0):
+        self.buckets = buckets
+        self.interactive_max_wait = interactive_max_wait
+
+    async def acquire(self, api: str, call: str, priority: Optional[str] = None) -> None:
+        """Take the units for one call, waiting briefly for interactive work; raise QuotaExceeded otherwise"""
+        bucket = self.buckets.get(api)
+        if bucket is None:
+            return
+        priority = priority or current_priority()
+        units = CALL_COSTS.get((api, call), 1)
+
+        if bucket.try_acquire(units, priority):
+            return
+        # Interactive requests may wait for a short refill; background work never waits
+        wait = bucket.wait_time(units, priority)
+        if priority == INTERACTIVE and wait <= self.interactive_max_wait:
+            await asyncio.sleep(wait)
+            if bucket.try_acquire(units, priority):
+                return
+        metrics.inc('rate_limited_total', api=api, priority=priority)
+        raise QuotaExceeded(api, priority)
+
+    def stats(self) -> Dict[str, float]:
+        """Units currently available per API"""
+        result = {}
+        for api, bucket in self.buckets.items():
+            bucket._refill()
+            result[api] = round(bucket.tokens, 2)
+        return result
+
+
+def _limiter_from_env() -> RateLimiter:
+    reserve = float(os.getenv('RATE_LIMIT_BACKGROUND_RESERVE', '0.3'))
+    youtube_daily = float(os.getenv('YOUTUBE_QUOTA_PER_DAY', '10000'))
+    serp_monthly = float(os.getenv('SERP_SEARCHES_PER_MONTH', '5000'))
+    gemini_rpm = float(os.getenv('GEMINI_RPM', '15'))
+    # Each of N worker processes gets 1/N of every budget
+    share = 1 / max(1, int(os.getenv('RATE_LIMIT_WORKERS', '1')))
+    return RateLimiter({
+        # Bursts are capped well below the daily quota so one spike can't spend the whole day
+        'youtube': TokenBucket(
+            float(os.getenv('YOUTUBE_BURST_UNITS', '1000')) * share, youtube_daily / 86400 * share, reserve
+        ),
+        'serp': TokenBucket(
+            float(os.getenv('SERP_BURST_SEARCHES', '20')) * share, serp_monthly / (30 * 86400) * share, reserve
+        ),
+        'gemini': TokenBucket(gemini_rpm * share, gemini_rpm / 60 * share, reserve)
+    }, interactive_max_wait=float(os.getenv('RATE_LIMIT_INTERACTIVE_WAIT', '1')))
+
+
+rate_limiter = _limiter_from_env()
+metrics.register_callback(
+    'rate_limit_available_units', 'gauge', 'api', rate_limiter.stats,
+    'Units currently available in each external API budget'
+)
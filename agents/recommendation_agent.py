@@ -1,106 +1,184 @@
 import os
-from typing import Dict, List, Any
-import google.generativeai as genai
+import json
+import asyncio
+import hashlib
+from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
+from agents.cache import profile_key
+from agents.shared_state import create_cache
+from agents.local_ranker import LocalRanker
+from agents.batcher import RankingBatcher
+from agents.metrics import metrics
+from agents.gemini import LazyGeminiModel
+from agents.content_item import ContentItem
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+RANKING_CACHE_TTL = float(os.getenv('RANKING_CACHE_TTL', '21600'))  # 6 hours
+RANKING_CACHE_FILE = os.getenv('RANKING_CACHE_FILE', '')  # Empty disables persistence
+# Gemini is an optional reranker on top of the local ranking, bounded by a latency budget
+RANKING_LLM_ENABLED = os.getenv('RANKING_LLM_ENABLED', 'true').lower() == 'true'
+RANKING_LLM_BUDGET = float(os.getenv('RANKING_LLM_BUDGET', '2.5'))
+# Ranking jobs from concurrent users are micro-batched into one Gemini request
+RANKING_BATCH_WINDOW_MS = float(os.getenv('RANKING_BATCH_WINDOW_MS', '30'))
+RANKING_BATCH_MAX = int(os.getenv('RANKING_BATCH_MAX', '8'))
+# Batched jobs time out inside the rerank budget (80% of it by default and at most),
+# so a job whose caller moved on never lingers in a later batch
+RANKING_BATCH_JOB_TIMEOUT = min(
+    float(os.getenv('RANKING_BATCH_JOB_TIMEOUT', str(RANKING_LLM_BUDGET * 0.8))), RANKING_LLM_BUDGET * 0.8
+)
 
 class RecommendationAgent:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = LazyGeminiModel()
+        self.local_ranker = LocalRanker()
+        self.batcher = RankingBatcher(
+            self.model,
+            window=RANKING_BATCH_WINDOW_MS / 1000,
+            max_batch=RANKING_BATCH_MAX,
+            job_timeout=RANKING_BATCH_JOB_TIMEOUT
+        )
+        # Memoized rankings, as ordered links, keyed on profile + hash(analysis, content set)
+        self.ranking_cache = create_cache(
+            'ranking',
+            ttl=RANKING_CACHE_TTL,
+            max_entries=5000,
+            persist_path=RANKING_CACHE_FILE or None
+        )
     
+    async def close(self) -> None:
+        """Write out the ranking cache"""
+        await self.ranking_cache.close()
+    
+    @staticmethod
+    def _ranking_key(preferences: Dict[str, Any], analysis: Dict[str, Any], content: List[ContentItem]) -> str:
+        digest = hashlib.sha1(json.dumps(
+            [analysis, [item.link for item in content]], sort_keys=True
+        ).encode('utf-8')).hexdigest()
+        return f"{profile_key(preferences)}:{digest}"
+    
+    @staticmethod
+    def _filter_by_time(content: List[ContentItem], preferences: Dict[str, Any]) -> List[ContentItem]:
+        """Keep content that fits the user's daily study time"""
+        filtered_content = []
+        study_hours = float(preferences.get('hours', 1)) * 60  # Convert to minutes
+        
+        for item in content:
+            # For articles, always include as they can be consumed in parts
+            if item.type == 'article' or item.duration_minutes is None:
+                filtered_content.append(item)
+            # For videos, include if they're less than 80% of available time
+            elif item.duration_minutes <= (study_hours * 0.8):
+                filtered_content.append(item)
+        
+        return filtered_content
+    
+    def quick_rank(
+        self,
+        content: List[ContentItem],
+        preferences: Dict[str, Any],
+        analysis: Optional[Dict[str, Any]] = None
+    ) -> List[ContentItem]:
+        """Local-only ranking for early partial results; never waits on Gemini"""
+        return self.local_ranker.rank(self._filter_by_time(content, preferences), preferences, analysis or {})
+    
+    @metrics.timed('recommendation.rank')
     async def filter_and_rank(
         self, 
-        content: List[Dict[str, Any]], 
+        content: List[ContentItem], 
         preferences: Dict[str, Any], 
         analysis: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
+    ) -> List[ContentItem]:
         """Filter and rank content based on user preferences and deliberative analysis"""
         if not content or not preferences:
             return []
         
         # First, basic filtering based on time constraints
-        filtered_content = []
-        study_hours = float(preferences.get('hours', 1)) * 60  # Convert to minutes
-        
-        for item in content:
-            # Extract duration in minutes
-            duration_str = item.get('duration', '0 menit')
-            try:
-                if 'menit' in duration_str:
-                    duration = int(duration_str.split()[0])
-                else:
-                    duration = 10  # Default time for articles
-                
-                # Only include items that fit within the user's study time
-                # For videos, include if they're less than 80% of available time
-                if item['type'] == 'video' and duration <= (study_hours * 0.8):
-                    filtered_content.append(item)
-                # For articles, always include as they can be consumed in parts
-                elif item['type'] == 'article':
-                    filtered_content.append(item)
-            except (ValueError, IndexError):
-                filtered_content.append(item)  # Include if we can't parse duration
-        
+        filtered_content = self._filter_by_time(content, preferences)
         if not filtered_content:
             return []
         
-        # Use Gemini AI for deliberative ranking based on user preferences
-        content_descriptions = "\n\n".join([
-            f"Content {idx + 1}:\n- Title: {item['title']}\n- Description: {item['description'][:200]}...\n- Type: {item['type']}\n- Duration: {item['duration']}"
-            for idx, item in enumerate(filtered_content[:10])  # Limit to 10 items for prompt size
-        ])
-        
-        prompt = f"""
-        As a learning content recommendation system, evaluate these content items for a student with these preferences:
+        key = self._ranking_key(preferences, analysis, filtered_content)
+        cached = await self._cached_ranking(key, filtered_content)
+        if cached is not None:
+            return cached
         
-        Student Profile:
-        - Field of study: {preferences.get('field')}
-        - Topic of interest: {preferences.get('topic')}
-        - Available study time: {preferences.get('hours')} hours per day
-        - Subtopics of interest: {', '.join(analysis.get('subtopics', []))}
-        - Preferred complexity: {analysis.get('complexity', 'beginner')}
+        # Fast path: local BM25 ranking, always available in a few milliseconds
+        local_ranking = self.local_ranker.rank(filtered_content, preferences, analysis)
+        if not RANKING_LLM_ENABLED:
+            return local_ranking
         
-        Content to evaluate:
-        {content_descriptions}
+        # Gemini reranks within a latency budget; the local ranking is served if it misses
+        try:
+            reranked = await asyncio.wait_for(
+                self._llm_rerank(local_ranking, preferences, analysis),
+                timeout=RANKING_LLM_BUDGET
+            )
+        except asyncio.TimeoutError:
+            metrics.inc('ranking_llm_timeouts_total')
+            print(f"Gemini ranking missed its {RANKING_LLM_BUDGET}s budget, serving local ranking")
+            return local_ranking
         
-        Rank these content items from 1-5 (5 being most relevant) based on:
-        1. Relevance to the student's topic and field
-        2. Appropriateness of complexity level
-        3. Efficiency given their time constraints
-        4. Educational value
+        if not reranked:
+            return local_ranking
+        await self.ranking_cache.set(key, [item.link for item in reranked])
+        return reranked
+    
+    async def _cached_ranking(self, key: str, content: List[ContentItem]) -> Optional[List[ContentItem]]:
+        """Map a memoized link order back onto content, or None if it doesn't fit this content"""
+        links = await self.ranking_cache.get(key)
+        if links is None:
+            return None
+        by_link = {item.link: item for item in content}
+        # Entries written before rankings were stored as links hold dicts instead
+        if len(links) != len(by_link) or not all(isinstance(link, str) and link in by_link for link in links):
+            return None
+        return [by_link[link] for link in links]
+    
+    async def _llm_rerank(
+        self,
+        candidates: List[ContentItem],
+        preferences: Dict[str, Any],
+        analysis: Dict[str, Any]
+    ) -> Optional[List[ContentItem]]:
+        """Rerank locally ranked candidates with Gemini, or return None if it fails"""
+        top_candidates = candidates[:10]  # Limit to 10 items for prompt size
+        content_descriptions = "\n\n".join([
+            f"Content {idx + 1}:\n- Title: {item.title}\n- Description: {item.description[:200]}...\n- Type: {item.type}\n- Duration: {item.duration_label}"
+            for idx, item in enumerate(top_candidates)
+        ])
         
-        Return ONLY a JSON array with objects containing content index (1-based) and score (1-5).
-        Example: [{{"index": 1, "score": 4}}, {{"index": 2, "score": 5}}]
-        """
+        job_text = f"""Student Profile:
+- Field of study: {preferences.get('field')}
+- Topic of interest: {preferences.get('topic')}
+- Available study time: {preferences.get('hours')} hours per day
+- Subtopics of interest: {', '.join(analysis.get('subtopics', []))}
+- Preferred complexity: {analysis.get('complexity', 'beginner')}
+
+Content to evaluate:
+{content_descriptions}"""
         
         try:
-            response = await self.model.generate_content_async(prompt)
-            response_text = response.text
+            # Concurrent jobs share one Gemini request through the batcher
+            scores = await self.batcher.submit(job_text)
             
-            # Extract JSON from response
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']') + 1
+            # Sort content based on scores
+            item_scores = {}
+            for score_item in scores:
+                idx = score_item.get('index', 0) - 1  # Convert to 0-based
+                if 0 <= idx < len(top_candidates) and idx not in item_scores:
+                    item_scores[idx] = score_item.get('score', 0)
+            if not item_scores:
+                return None
             
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                scores = eval(json_str)  # Parse the JSON safely
-                
-                # Sort content based on scores
-                scored_content = []
-                for score_item in scores:
-                    idx = score_item.get('index', 0) - 1  # Convert to 0-based
-                    if 0 <= idx < len(filtered_content):
-                        content_item = filtered_content[idx].copy()
-                        content_item['score'] = score_item.get('score', 0)
-                        scored_content.append(content_item)
-                
-                # Sort by score (highest first)
-                sorted_content = sorted(scored_content, key=lambda x: x.get('score', 0), reverse=True)
-                return sorted_content
-            else:
-                return filtered_content[:5]  # Return top 5 if parsing fails
+            # Sort by score (highest first); stable, so ties keep the local order
+            sorted_content = [
+                top_candidates[idx] for idx in sorted(item_scores, key=lambda i: (-item_scores[i], i))
+            ]
+            # Candidates Gemini did not score follow in local order
+            sorted_content.extend(
+                item for idx, item in enumerate(candidates) if idx not in item_scores
+            )
+            return sorted_content
         except Exception as e:
             print(f"Error ranking content: {e}")
-            return filtered_content[:5]  # Return top 5 if analysis fails
\ No newline at end of file
+            return None
@@ -0,0 +1,189 @@
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+from agents.metrics import metrics
+
+load_dotenv()
+# A breaker opens when, over its last BREAKER_WINDOW calls, the share of failures or of
+# calls slower than BREAKER_SLOW_SECONDS reaches BREAKER_THRESHOLD
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '5'))
+BREAKER_THRESHOLD = float(os.getenv('BREAKER_THRESHOLD', '0.5'))
+BREAKER_SLOW_SECONDS = float(os.getenv('BREAKER_SLOW_SECONDS', '3'))
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} circuit is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream is erroring or slow, then lets one probe call through"""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        threshold: float = BREAKER_THRESHOLD,
+        slow_seconds: float = BREAKER_SLOW_SECONDS,
+        open_seconds: float = BREAKER_OPEN_SECONDS
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._probe_started = 0.0  # When the half-open probe call was let through, 0 if none
+        self._generation = 0  # Bumped on every state change; outcomes of calls from an older one are ignored
+
+    def check(self) -> None:
+        """Raise CircuitOpen unless a call may go through now"""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                metrics.inc('circuit_rejections_total', upstream=self.name)
+                raise CircuitOpen(self.name)
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            now = time.monotonic()
+            # A probe that never reported back (e.g. it was rate limited) frees up after open_seconds
+            if self._probe_started and now - self._probe_started < self.open_seconds:
+                metrics.inc('circuit_rejections_total', upstream=self.name)
+                raise CircuitOpen(self.name)
+            self._probe_started = now
+
+    @contextmanager
+    def track(self):
+        """Record the outcome and latency of the enclosed call"""
+        started = time.perf_counter()
+        generation = self._generation
+        try:
+            yield
+        except asyncio.CancelledError:
+            if generation == self._generation:
+                self._probe_started = 0.0  # A caller giving up says nothing about the upstream
+            raise
+        except Exception:
+            self.record(failed=True, elapsed=time.perf_counter() - started, generation=generation)
+            raise
+        else:
+            self.record(failed=False, elapsed=time.perf_counter() - started, generation=generation)
+
+    def record(self, failed: bool, elapsed: float, generation: Optional[int] = None) -> None:
+        """Count one call's outcome; generation is the breaker's state generation when the call started"""
+        if generation is not None and generation != self._generation:
+            # The call began before the breaker last changed state, e.g. it was in flight when the
+            # circuit opened; it is neither evidence for the new state nor the half-open probe
+            return
+        slow = elapsed > self.slow_seconds
+        if self.state == HALF_OPEN:
+            self._probe_started = 0.0
+            if failed or slow:
+                self._open()
+            else:
+                self._set_state(CLOSED)
+                self._outcomes.clear()
+                print(f"{self.name} circuit closed")
+            return
+
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for f, _ in self._outcomes if f) / len(self._outcomes)
+        slow_calls = sum(1 for _, s in self._outcomes if s) / len(self._outcomes)
+        if failures >= self.threshold or slow_calls >= self.threshold:
+            self._open()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+
+    def _open(self):
+        self._set_state(OPEN)
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        metrics.inc('circuit_opened_total', upstream=self.name)
+        print(f"{self.name} circuit opened for {self.open_seconds}s")
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for percentile-based deadlines"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """The pct-th percentile, or None until enough calls were seen"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def hedged(
+    call: Callable[[], Awaitable[Any]],
+    delay: float,
+    before_hedge: Optional[Callable[[], Awaitable[None]]] = None
+) -> Any:
+    """Await call(); if it hasn't finished after delay, race it against a second call.
+
+    before_hedge runs before the second call, e.g. to charge its quota; if it raises,
+    no hedge is sent and the first call is awaited alone.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            try:
+                if before_hedge is not None:
+                    await before_hedge()
+            except Exception:
+                return await tasks[0]
+            metrics.inc('hedged_requests_total')
+            tasks.append(asyncio.ensure_future(call()))
+
+        # First successful response wins; fail only if every attempt failed
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        metrics.inc('hedged_requests_won_total')
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+circuit_breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name) for name in ('youtube', 'serp', 'gemini')
+}
+metrics.register_callback(
+    'circuit_state', 'gauge', 'upstream',
+    lambda: {name: STATE_VALUES[breaker.state] for name, breaker in circuit_breakers.items()},
+    'Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)'
+)
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+from agents.cache import CACHE_PERSIST_INTERVAL, TTLCache
+from agents.singleflight import SingleFlight
+
+load_dotenv()
+# Path of a SQLite file shared by every worker process; empty keeps all state in process memory
+SHARED_STATE_DB = os.getenv('SHARED_STATE_DB', '')
+PRUNE_EVERY_WRITES = 200
+
+
+class SharedState:
+    """SQLite (WAL) database holding caches and in-flight leases shared across worker processes.
+
+    Every query runs on one dedicated thread, so a lock held by another worker blocks
+    that thread for up to the busy timeout, never the event loop.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shared-state')
+
+    async def run(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expiry ON cache (namespace, expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def try_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """Take the lease on key unless another owner holds an unexpired one"""
+        now = time.time()
+        cursor = self.connection().execute(
+            "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at < ? OR leases.owner = excluded.owner",
+            (key, owner, now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: str) -> None:
+        self.connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class LocalCache:
+    """Async facade over an in-process TTLCache, with the same interface as SharedTTLCache.
+
+    A persisted cache is written on a worker thread at most every persist_interval seconds
+    after a change, and once more on close().
+    """
+
+    def __init__(self, cache: TTLCache, persist_interval: float = CACHE_PERSIST_INTERVAL):
+        self.cache = cache
+        self.persist_interval = persist_interval
+        self._save_timer: Optional[asyncio.TimerHandle] = None
+        self._save_lock = asyncio.Lock()
+        self._saving: Optional[asyncio.Future] = None  # Keeps the scheduled save task referenced
+
+    async def get(self, key: Any) -> Optional[Any]:
+        return self.cache.get(key)
+
+    async def get_stale(self, key: Any, max_stale: Optional[float] = None) -> Optional[Any]:
+        return self.cache.get_stale(key, max_stale)
+
+    async def set(self, key: Any, value: Any) -> None:
+        self.cache.set(key, value)
+        self._schedule_save()
+
+    async def delete(self, key: Any) -> None:
+        self.cache.delete(key)
+        self._schedule_save()
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
+
+    async def save(self) -> None:
+        """Persist pending changes on a worker thread"""
+        # One write at a time, so a later snapshot is never overwritten by an earlier one
+        async with self._save_lock:
+            entries = self.cache.snapshot()
+            if entries is not None:
+                await asyncio.to_thread(self.cache.write, entries)
+
+    async def close(self) -> None:
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        await self.save()
+
+    def _schedule_save(self) -> None:
+        if self.cache.dirty and self._save_timer is None:
+            self._save_timer = asyncio.get_running_loop().call_later(self.persist_interval, self._save_due)
+
+    def _save_due(self) -> None:
+        self._save_timer = None
+        self._saving = asyncio.ensure_future(self.save())
+
+
+class SharedTTLCache:
+    """TTLCache counterpart stored in SharedState, so every worker sees the same entries"""
+
+    def __init__(
+        self,
+        state: SharedState,
+        namespace: str,
+        ttl: float = 3600,
+        max_entries: int = 1000,
+        codec: Optional[Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = None,
+        keep_stale: bool = False
+    ):
+        self.state = state
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.codec = codec
+        self.keep_stale = keep_stale
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0  # As of the last prune; stats() must not query the database on the loop
+        self._writes = 0
+
+    def _row(self, key: Any):
+        return self.state.connection().execute(
+            "SELECT expires_at, value FROM cache WHERE namespace = ? AND key = ?", (self.namespace, str(key))
+        ).fetchone()
+
+    def _get(self, key: Any) -> Optional[Any]:
+        row = self._row(key)
+        if row is None or row[0] <= time.time():
+            if row is not None and not self.keep_stale:
+                self._delete(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._decode(row[1])
+
+    def _get_stale(self, key: Any, max_stale: Optional[float] = None) -> Optional[Any]:
+        row = self._row(key)
+        if row is None or (max_stale is not None and time.time() - row[0] > max_stale):
+            return None
+        return self._decode(row[1])
+
+    def _decode(self, text: str) -> Any:
+        value = json.loads(text)
+        return self.codec[1](value) if self.codec else value
+
+    def _set(self, key: Any, value: Any) -> None:
+        encoded = self.codec[0](value) if self.codec else value
+        self.state.connection().execute(
+            "INSERT INTO cache (namespace, key, expires_at, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(namespace, key) DO UPDATE SET expires_at = excluded.expires_at, value = excluded.value",
+            (self.namespace, str(key), time.time() + self.ttl, json.dumps(encoded))
+        )
+        self._writes += 1
+        if self._writes % PRUNE_EVERY_WRITES == 0:
+            self._prune()
+
+    def _prune(self):
+        """Drop the entries closest to expiry beyond max_entries"""
+        conn = self.state.connection()
+        self.size = conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        excess = self.size - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at LIMIT ?)",
+                (self.namespace, self.namespace, excess)
+            )
+            self.evictions += excess
+            self.size -= excess
+
+    def _delete(self, key: Any) -> None:
+        self.state.connection().execute(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, str(key))
+        )
+
+    async def get(self, key: Any) -> Optional[Any]:
+        return await self.state.run(self._get, key)
+
+    async def get_stale(self, key: Any, max_stale: Optional[float] = None) -> Optional[Any]:
+        return await self.state.run(self._get_stale, key, max_stale)
+
+    async def set(self, key: Any, value: Any) -> None:
+        await self.state.run(self._set, key, value)
+
+    async def delete(self, key: Any) -> None:
+        await self.state.run(self._delete, key)
+
+    async def close(self) -> None:
+        pass  # Every write already went to the shared database
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': self.size
+        }
+
+
+class SharedSingleFlight(SingleFlight):
+    """SingleFlight that also coalesces across processes through a lease in SharedState.
+
+    A process that finds the lease taken polls lookup() (usually the shared cache)
+    until the owner publishes a result, and runs fn itself if the lease expires.
+    """
+
+    def __init__(self, state: SharedState, lease_ttl: float = 15.0, poll_interval: float = 0.05):
+        super().__init__()
+        self.state = state
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.coalesced_remote = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        return await super().do(key, lambda: self._leased(str(key), fn, lookup))
+
+    async def _leased(
+        self, key: str, fn: Callable[[], Awaitable[Any]], lookup: Optional[Callable[[], Awaitable[Any]]]
+    ) -> Any:
+        deadline = time.time() + self.lease_ttl
+        while True:
+            if await self.state.run(self.state.try_lease, key, self.owner, self.lease_ttl):
+                try:
+                    return await fn()
+                finally:
+                    await self.state.run(self.state.release_lease, key, self.owner)
+            if lookup is not None:
+                value = await lookup()
+                if value is not None:
+                    self.coalesced_remote += 1
+                    return value
+            if time.time() > deadline:
+                return await fn()
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(super().stats(), coalesced_remote=self.coalesced_remote)
+
+
+_shared_state = SharedState(SHARED_STATE_DB) if SHARED_STATE_DB else None
+
+
+def create_cache(
+    namespace: str,
+    ttl: float,
+    max_entries: int,
+    persist_path: Optional[str] = None,
+    codec: Optional[Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = None,
+    keep_stale: bool = False
+):
+    """Build a cache shared across workers when SHARED_STATE_DB is set, else a local TTLCache.
+
+    Both expose async get/get_stale/set/delete, so shared lookups never block the event loop;
+    codec is an (encode, decode) pair for values that are not plain JSON; keep_stale keeps
+    expired entries for get_stale until they are evicted.
+    """
+    if _shared_state is not None:
+        return SharedTTLCache(
+            _shared_state, namespace, ttl=ttl, max_entries=max_entries, codec=codec, keep_stale=keep_stale
+        )
+    return LocalCache(TTLCache(
+        ttl=ttl, max_entries=max_entries, persist_path=persist_path, codec=codec, keep_stale=keep_stale
+    ))
+
+
+def create_singleflight() -> SingleFlight:
+    """Build a SingleFlight that coalesces across workers when SHARED_STATE_DB is set"""
+    if _shared_state is not None:
+        return SharedSingleFlight(_shared_state)
+    return SingleFlight()
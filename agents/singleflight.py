@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from agents.rate_limiter import BACKGROUND, INTERACTIVE, QuotaExceeded, SharedPriority, current_priority, shared_priority
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one shared future"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._priorities: Dict[Hashable, SharedPriority] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        """Run fn once per key at a time; concurrent callers wait for the same result or error.
+
+        lookup is only used by cross-process implementations to pick up another worker's result.
+        The shared call runs interactive once any interactive caller waits on it.
+        """
+        while True:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                self._priorities[key].join()
+            else:
+                self.executed += 1
+                priority = SharedPriority()
+                future = asyncio.ensure_future(self._run(fn, priority))
+                self._calls[key] = future
+                self._priorities[key] = priority
+                future.add_done_callback(lambda f: self._done(key, f))
+            try:
+                # Shielded so a caller that times out or is cancelled doesn't cancel it for the others
+                return await asyncio.shield(future)
+            except QuotaExceeded as e:
+                # Background work ran out of units before this caller joined; retry at its own priority
+                if e.priority != BACKGROUND or current_priority() != INTERACTIVE:
+                    raise
+
+    @staticmethod
+    async def _run(fn: Callable[[], Awaitable[Any]], priority: SharedPriority) -> Any:
+        with shared_priority(priority):
+            return await fn()
+
+    def _done(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+            del self._priorities[key]
+        if not future.cancelled():
+            future.exception()  # Mark retrieved even if every waiter has gone away
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls)
+        }
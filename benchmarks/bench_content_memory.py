@@ -0,0 +1,138 @@
+"""Memory held by cached content: legacy dict records vs. ContentItem.
+
+Builds N items from synthetic API responses (YouTube videos and articles with
+realistic description lengths), stores them in a TTLCache in pages of 5 as the
+coordinator does, and reports the memory retained per representation measured
+with tracemalloc. A share of items are re-fetches of earlier ones under another
+query, as happens when users with similar topics search.
+
+Usage: python -m benchmarks.bench_content_memory --items 100000 --description-chars 800
+"""
+import gc
+import os
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict
+from agents.cache import TTLCache
+from agents.content_item import DESCRIPTION_CHARS, ContentItem
+from benchmarks.bench_recommend import RESULTS_DIR, git_revision
+
+PAGE_SIZE = 5
+WORDS = ('belajar', 'materi', 'konsep', 'contoh', 'latihan', 'teori', 'praktik', 'dasar', 'lanjutan', 'kuliah',
+         'pembahasan', 'soal', 'ringkasan', 'penjelasan', 'metode', 'analisis', 'struktur', 'data', 'model', 'sistem')
+
+
+def fake_response(index: int, description_chars: int) -> Dict[str, Any]:
+    """One search result as parsed from an API response, with fresh (unshared) strings"""
+    rng = random.Random(index)
+    description = ' '.join(rng.choice(WORDS) for _ in range(description_chars // 6))[:description_chars]
+    if index % 2 == 0:
+        video_id = f"{index:011d}"
+        return {
+            'source': 'youtube',
+            'title': f"Video {index}: {rng.choice(WORDS)} {rng.choice(WORDS)}",
+            'description': description,
+            'link': f"https://www.youtube.com/watch?v={video_id}",
+            'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+            'minutes': rng.randint(3, 90),
+            'views': str(rng.randint(0, 5_000_000))
+        }
+    return {
+        'source': 'web',
+        'title': f"Artikel {index}: {rng.choice(WORDS)} {rng.choice(WORDS)}",
+        'description': description,
+        'link': f"https://example.com/artikel/{index}"
+    }
+
+
+def legacy_item(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """The dict format ContentAgent produced before ContentItem"""
+    if raw['source'] == 'youtube':
+        return {
+            'title': raw['title'],
+            'description': raw['description'],
+            'link': raw['link'],
+            'thumbnail': raw['thumbnail'],
+            'duration': f"{raw['minutes']} menit",
+            'views': raw['views'],
+            'source': 'youtube',
+            'type': 'video'
+        }
+    return {
+        'title': raw['title'],
+        'description': raw['description'],
+        'link': raw['link'],
+        'source': 'web',
+        'type': 'article',
+        'duration': '10-15 menit'
+    }
+
+
+def compact_item(raw: Dict[str, Any]) -> ContentItem:
+    if raw['source'] == 'youtube':
+        return ContentItem(raw['title'], raw['description'], raw['link'], 'youtube', raw['minutes'], int(raw['views']))
+    return ContentItem(raw['title'], raw['description'], raw['link'], 'web')
+
+
+def measure(build: Callable[[Dict[str, Any]], Any], args) -> Dict[str, Any]:
+    """Fill a TTLCache with args.items records built by build() and return the retained memory"""
+    unique = max(1, int(args.items * (1 - args.duplicates)))
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+
+    cache = TTLCache(ttl=3600, max_entries=args.items)
+    for start in range(0, args.items, PAGE_SIZE):
+        # Indexes past the unique range re-fetch earlier items, as a response parsed again would
+        page = [build(fake_response(i % unique, args.description_chars))
+                for i in range(start, min(start + PAGE_SIZE, args.items))]
+        cache.set(f"query-{start // PAGE_SIZE}", page)
+
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del cache
+    return {
+        'bytes': retained,
+        'bytes_per_item': round(retained / args.items, 1),
+        'build_seconds': round(elapsed, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--description-chars', type=int, default=800, help='description length in API responses')
+    parser.add_argument('--duplicates', type=float, default=0.2, help='share of items that re-fetch an earlier item')
+    parser.add_argument('--output', default='')
+    args = parser.parse_args()
+
+    runs = {'dict': measure(legacy_item, args), 'content_item': measure(compact_item, args)}
+    result = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'config': {
+            'items': args.items,
+            'description_chars': args.description_chars,
+            'duplicates': args.duplicates,
+            'stored_description_chars': DESCRIPTION_CHARS
+        },
+        'runs': runs,
+        'reduction': round(1 - runs['content_item']['bytes'] / runs['dict']['bytes'], 3)
+    }
+    print(json.dumps(result, indent=2))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"content-memory-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Measure preference write latency as the number of stored users grows.
+
+Usage: python -m benchmarks.bench_preference_store [--users 1000000] [--backend sqlite|json]
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from agents.preference_store import JSONPreferenceStore, SQLitePreferenceStore
+
+SAMPLE_WRITES = 1000
+PROFILE = {'field': 'Teknik Informatika', 'topic': 'Machine Learning', 'hours': 2.0}
+
+
+def checkpoints(max_users: int):
+    size = 1000
+    while size < max_users:
+        yield size
+        size *= 10
+    yield max_users
+
+
+def preload_sqlite(store: SQLitePreferenceStore, start: int, end: int):
+    """Bulk insert users directly so large populations are cheap to build"""
+    conn = store._connection()
+    payload = json.dumps(PROFILE)
+    now = time.time()
+    conn.executemany(
+        "INSERT OR IGNORE INTO preferences (user_id, data, updated_at) VALUES (?, ?, ?)",
+        ((user_id, payload, now) for user_id in range(start, end))
+    )
+    conn.commit()
+
+
+def preload_json(store: JSONPreferenceStore, start: int, end: int):
+    data = store._load()
+    for user_id in range(start, end):
+        data[user_id] = PROFILE
+
+
+async def time_writes(store, population: int) -> float:
+    """Return the mean latency (ms) of upserting SAMPLE_WRITES existing users"""
+    step = max(1, population // SAMPLE_WRITES)
+    user_ids = [i * step for i in range(SAMPLE_WRITES)]
+    started = time.perf_counter()
+    for user_id in user_ids:
+        await store.put(user_id, dict(PROFILE, hours=3.0))
+    return (time.perf_counter() - started) * 1000 / len(user_ids)
+
+
+async def run(backend: str, max_users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        if backend == 'sqlite':
+            store = SQLitePreferenceStore(os.path.join(tmp, 'user_data.db'))
+            preload = preload_sqlite
+        else:
+            store = JSONPreferenceStore(os.path.join(tmp, 'user_data.json'))
+            preload = preload_json
+
+        results = []
+        loaded = 0
+        for population in checkpoints(max_users):
+            preload(store, loaded, population)
+            loaded = population
+            write_ms = await time_writes(store, population)
+            results.append({'users': population, 'mean_write_ms': round(write_ms, 4)})
+            print(f"{backend:>6} users={population:>9,} mean write={write_ms:8.4f} ms")
+
+        await store.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--backend', choices=['sqlite', 'json'], default='sqlite')
+    args = parser.parse_args()
+    asyncio.run(run(args.backend, args.users))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""Offline end-to-end benchmark of /recommend against local API stand-ins.
+
+Drives AgentCoordinator.get_recommendations (--target coordinator) or the
+main.py command handlers (--target handlers) with N concurrent users and
+reports latency percentiles, throughput and external calls per request. The
+handlers target also reports time to the first message with content.
+
+Usage:
+    python -m benchmarks.bench_recommend --users 50 --requests 4 --topics 10 \
+        --latency gemini=900,serp=400 --error-rate serp=0.05 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import warnings
+from typing import Dict, List
+from benchmarks.fakes import SERVICES, FakeConfig, FakeUpstreams, HTTPGeminiModel
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+TOPICS = [
+    ('Teknik Informatika', 'Machine Learning'), ('Kedokteran', 'Anatomi'), ('Teknik Sipil', 'Struktur Beton'),
+    ('Ekonomi', 'Makroekonomi'), ('Hukum', 'Hukum Pidana'), ('Matematika', 'Aljabar Linear'),
+    ('Fisika', 'Mekanika Kuantum'), ('Kimia', 'Kimia Organik'), ('Biologi', 'Genetika'),
+    ('Psikologi', 'Psikologi Kognitif'), ('Akuntansi', 'Audit'), ('Arsitektur', 'Desain Urban')
+]
+
+
+def parse_service_map(text: str) -> Dict[str, float]:
+    """Parse 'gemini=900,serp=400' into {'gemini': 900.0, 'serp': 400.0}"""
+    values = {}
+    for part in filter(None, (text or '').split(',')):
+        name, value = part.split('=')
+        if name not in SERVICES:
+            raise argparse.ArgumentTypeError(f"Unknown service {name}; expected one of {SERVICES}")
+        values[name] = float(value)
+    return values
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(RESULTS_DIR), text=True
+        ).strip()
+    except Exception:
+        return 'unknown'
+
+
+def configure_environment(base_url: str, data_dir: str):
+    """Point every agent at the fake upstreams; must run before the agents are imported"""
+    os.environ['YOUTUBE_API_URL'] = f"{base_url}/youtube/v3"
+    os.environ['SERP_API_URL'] = f"{base_url}/serpapi/search"
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['CONTENT_CACHE_FILE'] = ''
+    os.environ.setdefault('TELEGRAM_TOKEN', '123456:bench')
+    os.environ.setdefault('YOUTUBE_API_KEY', 'bench')
+    os.environ.setdefault('SERP_API_KEY', 'bench')
+    os.environ.setdefault('GEMINI_API_KEY', 'bench')
+    # Budgets default high so the limiter doesn't shape the measurement; export lower values to test it
+    os.environ.setdefault('GEMINI_RPM', '100000')
+    os.environ.setdefault('YOUTUBE_BURST_UNITS', '10000000')
+    os.environ.setdefault('SERP_BURST_SEARCHES', '100000')
+
+
+def install_fake_gemini(bot_module, gemini: HTTPGeminiModel):
+    """Route every Gemini call made by the agents to the fake server"""
+    bot_module.preference_agent.model = gemini
+    bot_module.recommendation_agent.model = gemini
+    bot_module.recommendation_agent.batcher.model = gemini
+
+
+def make_update(bot, user_id: int, text: str, update_id: int):
+    from telegram import Update
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"},
+            'text': text
+        }
+    }, bot)
+
+
+async def run(args) -> Dict:
+    config = FakeConfig(items_per_page=args.items, description_chars=args.description_chars)
+    for name, latency in parse_service_map(args.latency).items():
+        config.profiles[name].latency_ms = latency
+    for name, rate in parse_service_map(args.error_rate).items():
+        config.profiles[name].error_rate = rate
+
+    upstreams = FakeUpstreams(config)
+    base_url = upstreams.start()
+    data_dir = tempfile.mkdtemp(prefix='bench-data-')
+    configure_environment(base_url, data_dir)
+
+    import main as bot_module  # Imported late so the environment above takes effect
+    from telegram import Bot
+
+    gemini = HTTPGeminiModel(base_url)
+    install_fake_gemini(bot_module, gemini)
+    coordinator = bot_module.coordinator
+    await coordinator.start()
+
+    bot = None
+    if args.target == 'handlers':
+        bot = Bot(os.environ['TELEGRAM_TOKEN'], base_url=f"{base_url}/telegram/bot")
+        await bot.initialize()
+
+    user_ids = list(range(1, args.users + 1))
+    for user_id in user_ids:
+        field, topic = TOPICS[user_id % min(args.topics, len(TOPICS))] if args.topics else TOPICS[0]
+        if args.topics > len(TOPICS):
+            topic = f"{topic} {user_id % args.topics}"
+        await coordinator.set_user_preferences(user_id, {'field': field, 'topic': topic, 'hours': 2.0})
+
+    if args.prefetch:
+        # Warm every user's result first, as the background JobQueue would
+        await coordinator.prefetch(len(user_ids))
+
+    latencies: List[float] = []
+    first_content: List[float] = []
+    failures = 0
+    update_counter = iter(range(1, 10**9))
+    calls_before = upstreams.snapshot()
+
+    async def user_session(user_id: int):
+        nonlocal failures
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            try:
+                if args.target == 'handlers':
+                    update = make_update(bot, user_id, '/recommend', next(update_counter))
+                    await bot_module.recommend(update, None)
+                    # First partial or final list sent to this chat during the request
+                    first_content.append(min(
+                        (stamp - started) * 1000 for stamp, _, chat_id, text in upstreams.messages
+                        if chat_id == user_id and stamp >= started and not text.startswith('🔍')
+                    ))
+                else:
+                    await coordinator.get_recommendations(user_id)
+            except Exception as e:
+                failures += 1
+                print(f"Request for user {user_id} failed: {e}", file=sys.stderr)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(user_session(user_id) for user_id in user_ids))
+    wall_seconds = time.perf_counter() - wall_started
+
+    calls_after = upstreams.snapshot()
+    total_requests = len(latencies)
+    ordered = sorted(latencies)
+    external_calls = {s: calls_after[s] - calls_before[s] for s in SERVICES}
+
+    result = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'config': {
+            'target': args.target,
+            'users': args.users,
+            'requests_per_user': args.requests,
+            'topics': args.topics,
+            'prefetch': args.prefetch,
+            'items_per_page': args.items,
+            'description_chars': args.description_chars,
+            'profiles': {name: vars(profile) for name, profile in config.profiles.items()}
+        },
+        'requests': total_requests,
+        'failures': failures,
+        'latency_ms': {
+            'p50': round(percentile(ordered, 50), 2),
+            'p95': round(percentile(ordered, 95), 2),
+            'p99': round(percentile(ordered, 99), 2),
+            'max': round(ordered[-1], 2) if ordered else 0.0
+        },
+        'first_content_ms': {
+            'p50': round(percentile(sorted(first_content), 50), 2),
+            'p95': round(percentile(sorted(first_content), 95), 2)
+        } if first_content else None,
+        'throughput_rps': round(total_requests / wall_seconds, 2) if wall_seconds else 0.0,
+        'external_calls_per_request': {
+            s: round(count / total_requests, 3) if total_requests else 0.0 for s, count in external_calls.items()
+        },
+        'upstream_errors': dict(upstreams.errors)
+    }
+
+    await coordinator.close()
+    await gemini.close()
+    if bot is not None:
+        await bot.shutdown()
+    upstreams.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=['coordinator', 'handlers'], default='coordinator')
+    parser.add_argument('--users', type=int, default=20, help='concurrent users')
+    parser.add_argument('--requests', type=int, default=3, help='sequential requests per user')
+    parser.add_argument('--topics', type=int, default=5, help='distinct profiles shared by the users')
+    parser.add_argument('--prefetch', action='store_true', help='precompute results before measuring')
+    parser.add_argument('--items', type=int, default=5, help='items per upstream page')
+    parser.add_argument('--description-chars', type=int, default=800)
+    parser.add_argument('--latency', default='', help='per-service mean latency in ms, e.g. gemini=900,serp=400')
+    parser.add_argument('--error-rate', default='', help='per-service error rate, e.g. serp=0.05')
+    parser.add_argument('--output', default='', help='JSON result path (default: benchmarks/results/<timestamp>.json)')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"recommend-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Throughput of webhook mode at different worker counts, against local API stand-ins.
+
+Spawns main.py webhook workers (sharing state through SHARED_STATE_DB), posts
+/recommend updates to them and measures time until each final reply reaches
+the fake Telegram API.
+
+Usage: python -m benchmarks.bench_webhook --workers 1,2,4 --updates 200
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import warnings
+import multiprocessing
+from typing import Dict, List
+import aiohttp
+from benchmarks.fakes import FakeConfig, FakeUpstreams, HTTPGeminiModel
+from benchmarks.bench_recommend import (
+    RESULTS_DIR, TOPICS, configure_environment, git_revision, install_fake_gemini, parse_service_map, percentile
+)
+
+WEBHOOK_PATH = '/telegram'
+FINAL_PREFIXES = ('🎓', 'Maaf')
+
+
+def _worker(index: int, base_url: str):
+    """Spawned worker process: route Gemini to the fake, then serve webhooks"""
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    import main as bot_module
+    install_fake_gemini(bot_module, HTTPGeminiModel(base_url))
+    bot_module.run_webhook_worker(index)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"Webhook workers did not start listening on port {port}")
+
+
+async def seed_preferences(data_dir: str, user_ids: List[int], topics: int):
+    from agents.preference_store import SQLitePreferenceStore
+    store = SQLitePreferenceStore(os.path.join(data_dir, 'user_data.db'))
+    for user_id in user_ids:
+        field, topic = TOPICS[user_id % min(topics, len(TOPICS))]
+        await store.put(user_id, {'field': field, 'topic': topic, 'hours': 2.0})
+    await store.close()
+
+
+def update_payload(user_id: int, update_id: int) -> Dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"},
+            'text': '/recommend',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 10}]
+        }
+    }
+
+
+async def run_workers(workers: int, args, upstreams: FakeUpstreams, base_url: str) -> Dict:
+    data_dir = tempfile.mkdtemp(prefix=f'bench-webhook-{workers}-')
+    port = free_port()
+    configure_environment(base_url, data_dir)
+    os.environ.update({
+        'BOT_MODE': 'webhook',
+        'TELEGRAM_API_URL': f"{base_url}/telegram/bot",
+        'WEBHOOK_LISTEN': '127.0.0.1',
+        'WEBHOOK_PORT': str(port),
+        'WEBHOOK_PATH': WEBHOOK_PATH,
+        'WEBHOOK_WORKERS': str(workers),
+        'RATE_LIMIT_WORKERS': str(workers),
+        'SHARED_STATE_DB': os.path.join(data_dir, 'shared_state.db') if workers > 1 else '',
+        'METRICS_PORT': '0'
+    })
+
+    user_ids = list(range(1, args.updates + 1))
+    await seed_preferences(data_dir, user_ids, args.topics)
+
+    mp_context = multiprocessing.get_context('spawn')
+    processes = [mp_context.Process(target=_worker, args=(i, base_url)) for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    try:
+        await wait_for_port(port)
+        await asyncio.sleep(args.warmup)
+
+        first_message = len(upstreams.messages)
+        sent_at = {}
+        url = f"http://127.0.0.1:{port}{WEBHOOK_PATH}"
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def post(session: aiohttp.ClientSession, user_id: int):
+            async with semaphore:
+                sent_at[user_id] = time.perf_counter()
+                async with session.post(url, json=update_payload(user_id, user_id)) as response:
+                    response.raise_for_status()
+
+        started = time.perf_counter()
+        # A fresh session per request spreads connections across the SO_REUSEPORT workers
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(force_close=True)) as session:
+            await asyncio.gather(*(post(session, user_id) for user_id in user_ids))
+
+        # Wait for the final reply (not the progress or partial message) to every update
+        done_at = {}
+        deadline = time.time() + args.timeout
+        while len(done_at) < len(user_ids) and time.time() < deadline:
+            for stamp, method, chat_id, text in upstreams.messages[first_message:]:
+                if chat_id in sent_at and chat_id not in done_at and text.startswith(FINAL_PREFIXES):
+                    done_at[chat_id] = stamp
+            await asyncio.sleep(0.05)
+        elapsed = max(done_at.values(), default=started) - started
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+    latencies = sorted((done_at[u] - sent_at[u]) * 1000 for u in done_at)
+    return {
+        'workers': workers,
+        'updates': len(user_ids),
+        'completed': len(done_at),
+        'throughput_ups': round(len(done_at) / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2)
+        }
+    }
+
+
+async def run(args) -> Dict:
+    config = FakeConfig()
+    for name, latency in parse_service_map(args.latency).items():
+        config.profiles[name].latency_ms = latency
+    upstreams = FakeUpstreams(config)
+    base_url = upstreams.start()
+
+    runs = []
+    for workers in (int(w) for w in args.workers.split(',')):
+        result = await run_workers(workers, args, upstreams, base_url)
+        print(json.dumps(result))
+        runs.append(result)
+    upstreams.stop()
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'config': {
+            'updates': args.updates,
+            'topics': args.topics,
+            'concurrency': args.concurrency,
+            'profiles': {name: vars(profile) for name, profile in config.profiles.items()}
+        },
+        'runs': runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='comma separated worker counts to compare')
+    parser.add_argument('--updates', type=int, default=100, help='/recommend updates per run, one per user')
+    parser.add_argument('--topics', type=int, default=12, help='distinct profiles shared by the users')
+    parser.add_argument('--concurrency', type=int, default=50, help='concurrent webhook POSTs')
+    parser.add_argument('--latency', default='', help='per-service mean latency in ms, e.g. gemini=900,serp=400')
+    parser.add_argument('--warmup', type=float, default=2.0, help='seconds to let every worker start')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--output', default='')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    result = asyncio.run(run(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"webhook-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == '__main__':
+    main()
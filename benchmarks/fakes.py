@@ -0,0 +1,244 @@
+"""Local stand-ins for YouTube Data API, SerpAPI, Gemini and Telegram Bot API.
+
+The fakes run on their own event loop in a background thread so their latency
+behaves like a remote service and never blocks the code under test.
+"""
+import re
+import json
+import zlib
+import time
+import random
+import asyncio
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+import aiohttp
+from aiohttp import web
+
+SERVICES = ('youtube', 'serp', 'gemini', 'telegram')
+
+
+@dataclass
+class ServiceProfile:
+    """Behaviour of one fake upstream"""
+    latency_ms: float = 100.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+
+
+@dataclass
+class FakeConfig:
+    profiles: Dict[str, ServiceProfile] = field(default_factory=lambda: {
+        'youtube': ServiceProfile(latency_ms=150),
+        'serp': ServiceProfile(latency_ms=400, jitter_ms=100),
+        'gemini': ServiceProfile(latency_ms=900, jitter_ms=200),
+        'telegram': ServiceProfile(latency_ms=40, jitter_ms=10)
+    })
+    items_per_page: int = 5
+    description_chars: int = 800
+    seed: int = 7
+
+
+class FakeUpstreams:
+    """aiohttp application serving every fake API, with per-service call counters"""
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.calls = Counter()
+        self.errors = Counter()
+        self._random = random.Random(config.seed)
+        self._message_id = 0
+        self.messages = []  # (perf_counter, method, chat_id, text) for every message sent or edited
+        self.base_url = None
+        self._loop = None
+        self._thread = None
+        self._runner = None
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start the fake servers in a background thread and return their base URL"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='fake-upstreams', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.base_url
+
+    async def _start(self, host: str, port: int):
+        app = web.Application()
+        app.router.add_get('/youtube/v3/search', self.youtube_search)
+        app.router.add_get('/youtube/v3/videos', self.youtube_videos)
+        app.router.add_get('/serpapi/search', self.serp_search)
+        app.router.add_post('/gemini/v1beta/models/{model}', self.gemini_generate)
+        app.router.add_post('/telegram/bot{token}/{method}', self.telegram_method)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{bound_port}"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {service: self.calls[service] for service in SERVICES}
+
+    # --- helpers ---------------------------------------------------------
+
+    async def _simulate(self, service: str) -> Optional[web.Response]:
+        """Apply latency and maybe fail; returns an error response when the call fails"""
+        profile = self.config.profiles[service]
+        self.calls[service] += 1
+        delay = max(0.0, self._random.gauss(profile.latency_ms, profile.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if self._random.random() < profile.error_rate:
+            self.errors[service] += 1
+            return web.json_response({'error': {'code': 500, 'message': 'fake upstream error'}}, status=500)
+        return None
+
+    def _text(self, seed: str) -> str:
+        words = (seed + " tutorial lecture guide ").split()
+        text = " ".join(words[i % len(words)] for i in range(self.config.description_chars // 6))
+        return text[:self.config.description_chars]
+
+    # --- YouTube Data API v3 ---------------------------------------------
+
+    async def youtube_search(self, request: web.Request) -> web.Response:
+        error = await self._simulate('youtube')
+        if error:
+            return error
+        query = request.query.get('q', '')
+        count = int(request.query.get('maxResults', self.config.items_per_page))
+        page = int(request.query.get('pageToken', '0') or 0)
+        items = [
+            {'id': {'videoId': f"{zlib.crc32(query.encode()) % 10**8}-{page * count + i}"}, 'snippet': {'title': query}}
+            for i in range(count)
+        ]
+        return web.json_response({'items': items, 'nextPageToken': str(page + 1)})
+
+    async def youtube_videos(self, request: web.Request) -> web.Response:
+        error = await self._simulate('youtube')
+        if error:
+            return error
+        items = []
+        for video_id in request.query.get('id', '').split(','):
+            minutes = 5 + int(video_id.rsplit('-', 1)[-1]) % 50
+            items.append({
+                'id': video_id,
+                'snippet': {
+                    'title': f"Video {video_id}",
+                    'description': self._text(f"video {video_id}"),
+                    'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}}
+                },
+                'contentDetails': {'duration': f"PT{minutes}M{minutes % 60}S"},
+                'statistics': {'viewCount': str(1000 * minutes)}
+            })
+        return web.json_response({'items': items})
+
+    # --- SerpAPI ---------------------------------------------------------
+
+    async def serp_search(self, request: web.Request) -> web.Response:
+        error = await self._simulate('serp')
+        if error:
+            return error
+        query = request.query.get('q', '')
+        count = int(request.query.get('num', self.config.items_per_page))
+        start = int(request.query.get('start', '0') or 0)
+        results = [
+            {
+                'title': f"Artikel {query} #{start + i}",
+                'link': f"https://example.org/{zlib.crc32(query.encode()) % 10**8}/{start + i}",
+                'snippet': self._text(query)[:300]
+            }
+            for i in range(count)
+        ]
+        return web.json_response({'organic_results': results})
+
+    # --- Gemini ----------------------------------------------------------
+
+    async def gemini_generate(self, request: web.Request) -> web.Response:
+        error = await self._simulate('gemini')
+        if error:
+            return error
+        body = await request.json()
+        prompt = body['contents'][0]['parts'][0]['text']
+        job_ids = re.findall(r"=== Job (job-\d+) ===", prompt)
+        if job_ids:
+            jobs = re.split(r"=== Job job-\d+ ===", prompt)[1:]
+            reply = {
+                job_id: [
+                    {'index': int(n), 'score': self._random.randint(1, 5)}
+                    for n in re.findall(r"Content (\d+):", job)
+                ]
+                for job_id, job in zip(job_ids, jobs)
+            }
+        else:
+            reply = {
+                'subtopics': ['dasar', 'lanjutan', 'praktik'],
+                'formats': ['video', 'article'],
+                'complexity': 'beginner'
+            }
+        return web.json_response({
+            'candidates': [{'content': {'parts': [{'text': json.dumps(reply)}], 'role': 'model'}}]
+        })
+
+    # --- Telegram Bot API ------------------------------------------------
+
+    async def telegram_method(self, request: web.Request) -> web.Response:
+        error = await self._simulate('telegram')
+        if error:
+            return web.json_response({'ok': False, 'error_code': 500, 'description': 'fake error'}, status=500)
+        method = request.match_info['method']
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'
+            }})
+        if method in ('setWebhook', 'deleteWebhook'):
+            return web.json_response({'ok': True, 'result': True})
+        data = await request.post() if request.content_type != 'application/json' else await request.json()
+        self.messages.append((time.perf_counter(), method, int(data.get('chat_id', 0)), data.get('text', '')))
+        self._message_id += 1
+        return web.json_response({'ok': True, 'result': {
+            'message_id': int(data.get('message_id', self._message_id)),
+            'date': int(time.time()),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': data.get('text', '')
+        }})
+
+
+class HTTPGeminiModel:
+    """Minimal async Gemini REST client used to route model calls to the fake server"""
+
+    class _Response:
+        def __init__(self, text: str):
+            self.text = text
+
+    def __init__(self, base_url: str, model_name: str = 'gemini-1.5-flash'):
+        self.url = f"{base_url}/gemini/v1beta/models/{model_name}:generateContent"
+        self._session = None
+
+    async def generate_content_async(self, prompt: str) -> Any:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        async with self._session.post(self.url, json={'contents': [{'parts': [{'text': prompt}]}]}) as response:
+            response.raise_for_status()
+            data = await response.json()
+        return self._Response(data['candidates'][0]['content']['parts'][0]['text'])
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
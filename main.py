@@ -1,16 +1,47 @@
 import os
+import time
+STARTUP_STARTED = time.perf_counter()
+import signal
+import asyncio
+import multiprocessing
+from aiohttp import web
 from dotenv import load_dotenv
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram import Bot, Update
+from telegram.error import BadRequest
+from telegram.ext import Application, BaseUpdateProcessor, CommandHandler, MessageHandler, filters, ContextTypes
 from agents.preference_agent import PreferenceAgent
 from agents.content_agent import ContentAgent
 from agents.recommendation_agent import RecommendationAgent
 from agents.coordinator import AgentCoordinator
+from agents.metrics import metrics, start_metrics_server
+from agents.cache import DATA_DIR
+from agents.gemini import warm_up as warm_up_gemini
+
+# Seconds from the start of this module to each startup milestone
+startup_timings = {'imports': round(time.perf_counter() - STARTUP_STARTED, 4)}
 
 # Load environment variables
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+BOT_MODE = os.getenv('BOT_MODE', 'polling')  # 'polling' or 'webhook'
+# Webhook mode: Telegram posts updates to WEBHOOK_URL, served by WEBHOOK_WORKERS processes
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '1'))
+# Updates handled at once; each user's updates still run one after another
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 disables the /metrics endpoint
+# Background prefetch of recommendations through the JobQueue
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '300'))
+PREFETCH_BATCH = int(os.getenv('PREFETCH_BATCH', '5'))
+PREFETCH_OFFPEAK_BATCH = int(os.getenv('PREFETCH_OFFPEAK_BATCH', '50'))
+PREFETCH_OFFPEAK_HOURS = os.getenv('PREFETCH_OFFPEAK_HOURS', '0-6')  # Local hours, end exclusive
+PREFETCH_SETPROFILE_DELAY = float(os.getenv('PREFETCH_SETPROFILE_DELAY', '1'))
 
 # Initialize agents
 preference_agent = PreferenceAgent()
@@ -23,6 +54,17 @@ coordinator = AgentCoordinator(
     content_agent=content_agent,
     recommendation_agent=recommendation_agent
 )
+# Agents only build configuration here; SDKs, sessions and stores open on first use
+startup_timings['agents'] = round(time.perf_counter() - STARTUP_STARTED, 4)
+metrics.register_callback(
+    'startup_seconds', 'gauge', 'phase', lambda: startup_timings,
+    'Seconds from process start to each startup milestone'
+)
+
+def mark_startup(phase: str, report: bool = False):
+    startup_timings[phase] = round(time.perf_counter() - STARTUP_STARTED, 4)
+    if report:
+        print("Startup: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in startup_timings.items()))
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
@@ -55,6 +97,10 @@ async def set_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
             'hours': float(hours.strip())
         })
         
+        # Warm the user's recommendations before they ask for them
+        if context.job_queue:
+            context.job_queue.run_once(prefetch_user_job, PREFETCH_SETPROFILE_DELAY, data=user_id)
+        
         await update.message.reply_text(
             f"Profil belajarmu telah diatur:\n"
             f"📚 Bidang: {field}\n"
@@ -68,6 +114,26 @@ async def set_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Contoh: /setprofile Teknik Informatika;Machine Learning;2"
         )
 
+def format_recommendations(recommendations, final: bool = True, start: int = 1) -> str:
+    if start > 1:
+        response = "📚 Rekomendasi berikutnya untukmu:\n\n"
+    elif final:
+        response = "🎓 Berikut rekomendasi konten belajar untukmu:\n\n"
+    else:
+        response = "⏳ Hasil awal, peringkat terbaik sedang disusun:\n\n"
+    
+    for i, rec in enumerate(recommendations, start):
+        response += f"{i}. {rec.title}\n"
+        response += f"   🔗 {rec.link}\n"
+        response += f"   ⏱️ Durasi: {rec.duration_label}\n"
+        response += f"   📝 {rec.description[:100]}...\n\n"
+    
+    if final:
+        response += "Gunakan /more untuk melihat rekomendasi lainnya. Semoga membantu belajarmu! 📚"
+    else:
+        response += "🔍 Masih mencari dari sumber lain..."
+    return response
+
 async def recommend(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
@@ -78,27 +144,52 @@ async def recommend(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    await update.message.reply_text("🔍 Sedang mencari konten belajar yang sesuai untukmu...")
+    started = time.perf_counter()
+    message = await update.message.reply_text("🔍 Sedang mencari konten belajar yang sesuai untukmu...")
+    first_content = None
+    
+    async def show_partial(partial):
+        # The fastest source (or the cache) goes out first; the same message is edited with the final list
+        nonlocal first_content
+        await message.edit_text(format_recommendations(partial, final=False))
+        first_content = time.perf_counter()
     
     # Get recommendations from coordinator
-    recommendations = await coordinator.get_recommendations(user_id)
+    recommendations = await coordinator.get_recommendations(user_id, on_partial=show_partial)
     
     if not recommendations:
+        text = "Maaf, saya tidak dapat menemukan rekomendasi yang sesuai saat ini. Coba lagi nanti."
+    else:
+        text = format_recommendations(recommendations)
+    try:
+        await message.edit_text(text)
+    except BadRequest as e:
+        # Editing fails if the message is gone; the user still gets the answer
+        print(f"Could not edit recommendation message: {e}")
+        await update.message.reply_text(text)
+    
+    finished = time.perf_counter()
+    metrics.observe('recommend_response_seconds', (first_content or finished) - started, phase='first_content')
+    metrics.observe('recommend_response_seconds', finished - started, phase='total')
+
+async def more(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    
+    if not await coordinator.has_preferences(user_id):
         await update.message.reply_text(
-            "Maaf, saya tidak dapat menemukan rekomendasi yang sesuai saat ini. Coba lagi nanti."
+            "Kamu belum mengatur preferensi belajar. Gunakan /profile terlebih dahulu."
+        )
+        return
+    
+    # Next page of the ranked list from /recommend, fetching further results only when it runs out
+    recommendations, start = await coordinator.more_recommendations(user_id)
+    
+    if not recommendations:
+        await update.message.reply_text(
+            "Maaf, belum ada rekomendasi tambahan saat ini. Coba lagi nanti atau gunakan /recommend."
         )
     else:
-        response = "🎓 Berikut rekomendasi konten belajar untukmu:\n\n"
-        
-        for i, rec in enumerate(recommendations, 1):
-            response += f"{i}. {rec['title']}\n"
-            response += f"   🔗 {rec['link']}\n"
-            response += f"   ⏱️ Durasi: {rec['duration']}\n"
-            response += f"   📝 {rec['description'][:100]}...\n\n"
-        
-        response += "Semoga membantu belajarmu! 📚"
-        
-        await update.message.reply_text(response)
+        await update.message.reply_text(format_recommendations(recommendations, start=start))
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
@@ -107,12 +198,125 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/profile - Mengatur preferensi belajar\n"
         "/setprofile - Menyimpan preferensi (format: jurusan;topik;jam_belajar)\n"
         "/recommend - Mendapatkan rekomendasi konten belajar\n"
+        "/more - Menampilkan rekomendasi berikutnya\n"
         "/help - Menampilkan bantuan"
     )
 
-def main():
+def is_offpeak(hour: int) -> bool:
+    start_hour, end_hour = (int(h) for h in PREFETCH_OFFPEAK_HOURS.split('-'))
+    if start_hour <= end_hour:
+        return start_hour <= hour < end_hour
+    return hour >= start_hour or hour < end_hour  # Window wraps past midnight
+
+async def prefetch_job(context: ContextTypes.DEFAULT_TYPE):
+    # Do most of the work off-peak; during the day only keep the most active users warm
+    batch = PREFETCH_OFFPEAK_BATCH if is_offpeak(time.localtime().tm_hour) else PREFETCH_BATCH
+    await coordinator.prefetch(batch)
+
+async def prefetch_user_job(context: ContextTypes.DEFAULT_TYPE):
+    try:
+        await coordinator.prefetch_user(context.job.data)
+    except Exception as e:
+        print(f"Error prefetching recommendations for user {context.job.data}: {e}")
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Handles updates concurrently up to a limit while keeping each user's updates in order.
+
+    A user may have only one update per exclusive command queued or running; repeats
+    are answered with on_duplicate instead of being processed again.
+    """
+
+    def __init__(self, max_concurrent_updates: int, exclusive_commands=(), on_duplicate=None):
+        super().__init__(max_concurrent_updates)
+        self.exclusive_commands = frozenset(exclusive_commands)
+        self.on_duplicate = on_duplicate
+        self._users = {}  # user_id -> [lock, updates queued or running]
+        self._exclusive = set()  # (user_id, command) queued or running
+
+    @staticmethod
+    def _command(update: Update):
+        text = update.message.text if update.message else None
+        if not text or not text.startswith('/'):
+            return None
+        return text[1:].split(maxsplit=1)[0].split('@')[0].lower()
+
+    async def process_update(self, update, coroutine):
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            await super().process_update(update, coroutine)
+            return
+
+        command = self._command(update)
+        exclusive = (user.id, command) if command in self.exclusive_commands else None
+        if exclusive is not None:
+            if exclusive in self._exclusive:
+                coroutine.close()
+                metrics.inc('duplicate_updates_dropped_total', command=command)
+                if self.on_duplicate is not None:
+                    await self.on_duplicate(update)
+                return
+            self._exclusive.add(exclusive)
+
+        # Take the user's lock before a concurrency slot, so a queued user doesn't hold one
+        entry = self._users.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._users[user.id]
+            self._exclusive.discard(exclusive)
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+async def busy_notice(update: Update):
+    try:
+        await update.message.reply_text("⏳ Permintaanmu sebelumnya masih diproses, tunggu sebentar ya.")
+    except Exception as e:
+        print(f"Error sending busy notice: {e}")
+
+async def on_startup(application: Application):
+    # Open pooled HTTP connections before the first update arrives
+    await coordinator.start()
+    # Import the Gemini SDK on a thread now, so the first request doesn't block the loop on it
+    application.bot_data['gemini_warmup'] = asyncio.ensure_future(warm_up_gemini())
+    if METRICS_PORT:
+        # Each webhook worker exposes its own metrics port
+        port = METRICS_PORT + application.bot_data.get('worker_index', 0)
+        application.bot_data['metrics_runner'] = await start_metrics_server(port)
+    # Polling starts right after this hook; webhook workers report once they process updates
+    mark_startup('initialized', report=application.updater is not None)
+
+async def on_shutdown(application: Application):
+    await coordinator.close()
+    if 'metrics_runner' in application.bot_data:
+        await application.bot_data['metrics_runner'].cleanup()
+
+def build_application(with_updater: bool = True) -> Application:
     # Create the Application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .concurrent_updates(PerUserUpdateProcessor(
+            CONCURRENT_UPDATES, exclusive_commands=('recommend', 'more'), on_duplicate=busy_notice
+        ))
+    )
+    if not with_updater:
+        # Webhook workers receive updates from our own HTTP server
+        builder = builder.updater(None)
+    application = builder.build()
 
     # Add handlers
     application.add_handler(CommandHandler("start", start))
@@ -120,9 +324,102 @@ def main():
     application.add_handler(CommandHandler("profile", profile_command))
     application.add_handler(CommandHandler("setprofile", set_profile))
     application.add_handler(CommandHandler("recommend", recommend))
+    application.add_handler(CommandHandler("more", more))
+
+    # Keep recommendations warm in the background
+    if application.job_queue:
+        application.job_queue.run_repeating(prefetch_job, interval=PREFETCH_INTERVAL, first=PREFETCH_INTERVAL)
+    else:
+        print("JobQueue unavailable (install python-telegram-bot[job-queue]); background prefetch disabled")
 
-    # Run the bot
-    application.run_polling()
+    return application
+
+async def serve_webhook(worker_index: int = 0):
+    """Run one webhook worker: an aiohttp server feeding updates into the Application"""
+    application = build_application(with_updater=False)
+    application.bot_data['worker_index'] = worker_index
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+            return web.Response(status=403)
+        data = await request.json()
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return web.Response()
+
+    web_app = web.Application()
+    web_app.router.add_post(WEBHOOK_PATH, handle_update)
+    runner = web.AppRunner(web_app)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    # Bind first: updates queue up while the bot initializes and are handled once it starts
+    await runner.setup()
+    # SO_REUSEPORT lets every worker bind the same port; the kernel spreads connections
+    await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT, reuse_port=WEBHOOK_WORKERS > 1).start()
+    mark_startup('accepting_updates')
+    print(f"Worker {worker_index} (pid {os.getpid()}) accepting updates on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    try:
+        await application.initialize()
+        await on_startup(application)
+        await application.start()
+        mark_startup('processing_updates', report=True)
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+        await on_shutdown(application)
+        await application.shutdown()
+
+def run_webhook_worker(worker_index: int):
+    asyncio.run(serve_webhook(worker_index))
+
+async def register_webhook():
+    if not WEBHOOK_URL:
+        print("WEBHOOK_URL is not set; assuming the webhook is already registered")
+        return
+    async with Bot(TELEGRAM_TOKEN, base_url=TELEGRAM_API_URL) as bot:
+        await bot.set_webhook(WEBHOOK_URL, secret_token=WEBHOOK_SECRET or None)
+
+def run_webhook():
+    if WEBHOOK_WORKERS > 1:
+        if os.getenv('PREFERENCE_STORE', 'sqlite') != 'sqlite':
+            raise SystemExit("Multiple webhook workers need PREFERENCE_STORE=sqlite")
+        # Workers are spawned fresh, so they pick up the shared-state settings below
+        if not os.getenv('SHARED_STATE_DB'):
+            os.environ['SHARED_STATE_DB'] = os.path.join(DATA_DIR, 'shared_state.db')
+        os.environ['RATE_LIMIT_WORKERS'] = str(WEBHOOK_WORKERS)
+
+    asyncio.run(register_webhook())
+    if WEBHOOK_WORKERS == 1:
+        run_webhook_worker(0)
+        return
+
+    mp_context = multiprocessing.get_context('spawn')
+    workers = [
+        mp_context.Process(target=run_webhook_worker, args=(index,), name=f"bot-worker-{index}")
+        for index in range(WEBHOOK_WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+def main():
+    if BOT_MODE == 'webhook':
+        run_webhook()
+    else:
+        # Run the bot
+        build_application().run_polling()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
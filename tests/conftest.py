@@ -0,0 +1,15 @@
+import pytest
+from tests.fakes import FakeContentAgent
+
+
+@pytest.fixture
+def content_agent() -> FakeContentAgent:
+    return FakeContentAgent()
+
+
+@pytest.fixture
+def coordinator(content_agent):
+    from agents.coordinator import AgentCoordinator
+    from agents.preference_agent import PreferenceAgent
+    from agents.recommendation_agent import RecommendationAgent
+    return AgentCoordinator(PreferenceAgent(), content_agent, RecommendationAgent())
@@ -0,0 +1,36 @@
+from typing import Dict, List, Optional, Tuple
+from agents.content_item import ContentItem
+
+
+def video(n: int, title: str = 'Photosynthesis lesson', description: str = 'plants and light') -> ContentItem:
+    return ContentItem(f"{title} {n}", description, f"https://www.youtube.com/watch?v=vid{n}", 'youtube', 10, 100 + n)
+
+
+def article(n: int, title: str = 'Photosynthesis article') -> ContentItem:
+    return ContentItem(f"{title} {n}", 'how plants use light', f"https://example.com/artikel/{n}", 'web')
+
+
+class FakeContentAgent:
+    """ContentAgent stand-in serving canned pages and recording every upstream search"""
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog
+        self.calls: List[Tuple[str, str, object]] = []
+        # page token (None for the first page) -> (items, next page token)
+        self.youtube_pages: Dict[Optional[str], Tuple[List[ContentItem], Optional[str]]] = {}
+        self.articles: List[ContentItem] = []
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def search_youtube_page(self, query: str, max_results: int = 5, page_token: Optional[str] = None):
+        self.calls.append(('youtube', query, page_token))
+        return self.youtube_pages.get(page_token, ([], None))
+
+    async def search_articles_page(self, query: str, max_results: int = 5, start: int = 0):
+        self.calls.append(('web', query, start))
+        page = self.articles[start:start + max_results]
+        return page, start + len(page) if len(page) >= max_results else None
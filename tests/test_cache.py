@@ -0,0 +1,83 @@
+import json
+import time
+import asyncio
+from agents.cache import TTLCache
+from agents.shared_state import LocalCache
+
+
+def expire(cache: TTLCache, key: str):
+    """Backdate an entry so it is already expired"""
+    _, value = cache._entries[key]
+    cache._entries[key] = (time.time() - 1, value)
+
+
+def test_get_returns_fresh_value():
+    cache = TTLCache(ttl=60)
+    cache.set('a', [1])
+    assert cache.get('a') == [1]
+    assert cache.stats()['hits'] == 1
+
+
+def test_expired_entry_is_dropped_by_default():
+    cache = TTLCache(ttl=60)
+    cache.set('a', [1])
+    expire(cache, 'a')
+    assert cache.get('a') is None
+    assert cache.get_stale('a') is None
+    assert len(cache) == 0
+
+
+def test_keep_stale_serves_expired_entry():
+    cache = TTLCache(ttl=60, keep_stale=True)
+    cache.set('a', [1])
+    expire(cache, 'a')
+    assert cache.get('a') is None
+    assert 'a' not in cache
+    assert cache.get_stale('a') == [1]
+    assert cache.stats()['misses'] == 1
+
+
+def test_max_stale_limits_how_old_a_stale_entry_may_be():
+    cache = TTLCache(ttl=60, keep_stale=True)
+    cache.set('a', [1])
+    _, value = cache._entries['a']
+    cache._entries['a'] = (time.time() - 120, value)
+    assert cache.get_stale('a', max_stale=300) == [1]
+    assert cache.get_stale('a', max_stale=60) is None
+
+
+def test_stale_entries_are_evicted_like_any_other():
+    cache = TTLCache(ttl=60, max_entries=2, keep_stale=True)
+    cache.set('a', 1)
+    expire(cache, 'a')
+    cache.set('b', 2)
+    cache.set('c', 3)
+    assert cache.get_stale('a') is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_persisted_entries_round_trip_through_codec(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    codec = (lambda v: {'wrapped': v}, lambda v: v['wrapped'])
+    cache = TTLCache(ttl=60, persist_path=path, codec=codec)
+    cache.set('a', [1, 2])
+    cache.save()
+    assert TTLCache(ttl=60, persist_path=path, codec=codec).get('a') == [1, 2]
+
+
+def test_local_cache_batches_writes_off_the_hot_path(tmp_path):
+    path = tmp_path / 'cache.json'
+    cache = LocalCache(TTLCache(ttl=60, persist_path=str(path)), persist_interval=0.05)
+
+    async def scenario():
+        await cache.set('a', 1)
+        await cache.set('b', 2)
+        assert not path.exists()  # set() never writes the file itself
+        await asyncio.sleep(0.2)
+        assert len(json.loads(path.read_text())) == 2
+        await cache.delete('a')
+        await cache.close()
+
+    asyncio.run(scenario())
+    assert TTLCache(ttl=60, persist_path=str(path)).get('b') == 2
+    assert TTLCache(ttl=60, persist_path=str(path)).get('a') is None
@@ -0,0 +1,105 @@
+import json
+import asyncio
+import sqlite3
+import pytest
+from agents.catalog import ContentCatalog
+from tests.fakes import video
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = ContentCatalog(str(tmp_path / 'catalog.db'))
+    yield catalog
+    asyncio.run(catalog.close())
+
+
+def test_other_topic_in_same_field_does_not_match(catalog):
+    async def scenario():
+        await catalog.add('youtube', 'photosynthesis biology', [video(i) for i in range(6)])
+        by_topic = await catalog.search('youtube', 'genetics biology', 5, required='genetics')
+        by_query = await catalog.search('youtube', 'genetics biology', 5)
+        return by_topic, by_query
+
+    assert asyncio.run(scenario()) == ([], [])
+
+
+def test_same_topic_matches_on_item_content(catalog):
+    async def scenario():
+        await catalog.add('youtube', 'photosynthesis biology', [video(i) for i in range(6)])
+        return await catalog.search('youtube', 'photosynthesis biology', 5, required='photosynthesis')
+
+    items = asyncio.run(scenario())
+    assert len(items) == 5
+    assert all('Photosynthesis' in item.title for item in items)
+
+
+def test_query_tokens_are_not_indexed(catalog):
+    async def scenario():
+        await catalog.add('youtube', 'photosynthesis biology', [video(i) for i in range(3)])
+        return await catalog.search('youtube', 'biology', 5)
+
+    # 'biology' only appears in the query that found the items, not in the items
+    assert asyncio.run(scenario()) == []
+
+
+def test_search_is_limited_to_source(catalog):
+    async def scenario():
+        await catalog.add('youtube', 'photosynthesis biology', [video(i) for i in range(3)])
+        return await catalog.search('web', 'photosynthesis', 5)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_old_postings_are_rebuilt_without_query_tokens(tmp_path):
+    path = str(tmp_path / 'catalog.db')
+    item = video(1)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE items (link TEXT PRIMARY KEY, source TEXT NOT NULL, query TEXT NOT NULL, "
+        "duration_minutes INTEGER, views INTEGER, fetched_at REAL NOT NULL, data TEXT NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE postings (token TEXT NOT NULL, link TEXT NOT NULL, weight INTEGER NOT NULL, "
+        "PRIMARY KEY (token, link)) WITHOUT ROWID"
+    )
+    conn.execute("INSERT INTO items VALUES (?, 'youtube', 'photosynthesis biology', 10, 101, strftime('%s','now'), ?)",
+                 (item.link, json.dumps(item.to_row())))
+    conn.execute("INSERT INTO postings VALUES ('biology', ?, 2)", (item.link,))
+    conn.commit()
+    conn.close()
+
+    catalog = ContentCatalog(path)
+
+    async def scenario():
+        try:
+            return (await catalog.search('youtube', 'biology', 5),
+                    await catalog.search('youtube', 'photosynthesis', 5))
+        finally:
+            await catalog.close()
+
+    stale_match, content_match = asyncio.run(scenario())
+    assert stale_match == []
+    assert [i.link for i in content_match] == [item.link]
+
+
+def test_old_items_and_their_postings_are_pruned(catalog, monkeypatch):
+    monkeypatch.setattr('agents.catalog.PRUNE_EVERY_ADDS', 1)
+
+    def backdate():
+        conn = sqlite3.connect(catalog.db_path)
+        conn.execute("UPDATE items SET fetched_at = 0")
+        conn.commit()
+        conn.close()
+
+    async def scenario():
+        await catalog.add('youtube', 'photosynthesis biology', [video(i) for i in range(3)])
+        backdate()
+        await catalog.add('youtube', 'photosynthesis biology', [video(9)])
+
+    asyncio.run(scenario())
+    conn = sqlite3.connect(catalog.db_path)
+    items = conn.execute("SELECT link FROM items").fetchall()
+    postings = {row[0] for row in conn.execute("SELECT DISTINCT link FROM postings")}
+    conn.close()
+    assert items == [(video(9).link,)]
+    assert postings == {video(9).link}
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from agents.content_agent import ContentAgent
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr('agents.content_agent.create_catalog', lambda: None)
+    return ContentAgent()
+
+
+def test_search_without_videos_skips_the_details_call(agent):
+    calls = []
+
+    async def youtube_get(resource, params):
+        calls.append(resource)
+        return {
+            'items': [{'id': {'kind': 'youtube#channel', 'channelId': 'UC1'}},
+                      {'id': {'kind': 'youtube#playlist', 'playlistId': 'PL1'}}],
+            'nextPageToken': 'p2'
+        }
+    agent._youtube_get = youtube_get
+
+    assert asyncio.run(agent.search_youtube_page('photosynthesis')) == ([], 'p2')
+    assert calls == ['search']
+
+
+def test_malformed_video_is_skipped(agent):
+    async def youtube_get(resource, params):
+        if resource == 'search':
+            return {'items': [{'id': {'videoId': 'a'}}, {'id': {'videoId': 'b'}}]}
+        return {'items': [
+            {'id': 'a', 'snippet': {'title': 'Good'}, 'contentDetails': {'duration': 'PT12M3S'},
+             'statistics': {'viewCount': '7'}},
+            {'id': 'b', 'snippet': {'title': 'Broken'}}
+        ]}
+    agent._youtube_get = youtube_get
+
+    results, cursor = asyncio.run(agent.search_youtube_page('photosynthesis'))
+    assert [(item.title, item.duration_minutes, item.views) for item in results] == [('Good', 12, 7)]
+    assert cursor is None
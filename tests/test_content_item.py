@@ -0,0 +1,63 @@
+import json
+from agents.content_item import DESCRIPTION_CHARS, ENTRY_CODEC, ITEMS_CODEC, ContentItem
+
+
+def test_row_round_trip():
+    item = ContentItem('Aljabar', 'Pembahasan soal', 'https://www.youtube.com/watch?v=abc123', 'youtube', 12, 345)
+    row = json.loads(json.dumps(item.to_row()))
+    assert ContentItem.decode(row).to_row() == item.to_row()
+
+
+def test_decodes_legacy_video_dict():
+    item = ContentItem.decode({
+        'title': 'Aljabar',
+        'description': 'Pembahasan soal',
+        'link': 'https://www.youtube.com/watch?v=abc123',
+        'thumbnail': 'https://i.ytimg.com/vi/abc123/hqdefault.jpg',
+        'duration': '12 menit',
+        'views': '345',
+        'source': 'youtube',
+        'type': 'video'
+    })
+    assert item.duration_minutes == 12
+    assert item.views == 345
+    assert item.type == 'video'
+    assert item.thumbnail == 'https://i.ytimg.com/vi/abc123/hqdefault.jpg'
+    assert item.duration_label == '12 menit'
+
+
+def test_decodes_legacy_article_dict():
+    item = ContentItem.decode({
+        'title': 'Artikel',
+        'description': 'Ringkasan',
+        'link': 'https://example.com/artikel',
+        'source': 'web',
+        'type': 'article',
+        'duration': '10-15 menit'
+    })
+    assert item.duration_minutes is None
+    assert item.views == 0
+    assert item.type == 'article'
+    assert item.thumbnail is None
+    assert item.duration_label == '10-15 menit'
+
+
+def test_description_is_truncated():
+    item = ContentItem('Judul', 'x' * (DESCRIPTION_CHARS + 50), 'https://example.com', 'web')
+    assert len(item.description) == DESCRIPTION_CHARS
+
+
+def test_codecs_round_trip_through_json():
+    items = [
+        ContentItem('Video', 'Deskripsi', 'https://www.youtube.com/watch?v=abc123', 'youtube', 7, 10),
+        ContentItem('Artikel', 'Deskripsi', 'https://example.com/artikel', 'web')
+    ]
+    encode, decode = ITEMS_CODEC
+    restored = decode(json.loads(json.dumps(encode(items))))
+    assert [item.to_row() for item in restored] == [item.to_row() for item in items]
+
+    encode, decode = ENTRY_CODEC
+    entry = {'items': items, 'complete': True}
+    restored = decode(json.loads(json.dumps(encode(entry))))
+    assert restored['complete'] is True
+    assert [item.to_row() for item in restored['items']] == [item.to_row() for item in items]
@@ -0,0 +1,34 @@
+import asyncio
+from agents.catalog import ContentCatalog
+from tests.fakes import video
+
+
+def test_new_topic_in_cataloged_field_goes_live(tmp_path, coordinator, content_agent):
+    content_agent.catalog = ContentCatalog(str(tmp_path / 'catalog.db'))
+    genetics = [video(i, title='Genetics lecture', description='genes and heredity') for i in range(10, 15)]
+    content_agent.youtube_pages[None] = (genetics, None)
+
+    async def scenario():
+        try:
+            await content_agent.catalog.add('youtube', 'photosynthesis biology', [video(i) for i in range(6)])
+            return await coordinator._search_source('youtube', 'genetics biology', 5, topic='genetics')
+        finally:
+            await content_agent.catalog.close()
+
+    items = asyncio.run(scenario())
+    assert content_agent.calls == [('youtube', 'genetics biology', None)]
+    assert [item.link for item in items] == [item.link for item in genetics]
+
+
+def test_cataloged_topic_is_served_without_live_search(tmp_path, coordinator, content_agent):
+    content_agent.catalog = ContentCatalog(str(tmp_path / 'catalog.db'))
+
+    async def scenario():
+        try:
+            await content_agent.catalog.add('youtube', 'photosynthesis biology', [video(i) for i in range(6)])
+            return await coordinator._search_source('youtube', 'photosynthesis botany', 5, topic='photosynthesis')
+        finally:
+            await content_agent.catalog.close()
+
+    assert len(asyncio.run(scenario())) == 5
+    assert content_agent.calls == []
@@ -0,0 +1,77 @@
+import asyncio
+from agents.cache import normalize_query
+from tests.fakes import article, video
+
+QUERY = 'photosynthesis biology'
+
+
+def links(items):
+    return [item.link for item in items]
+
+
+def test_known_cursor_fetches_the_next_page_directly(coordinator, content_agent):
+    content_agent.youtube_pages = {
+        None: ([video(i) for i in range(5)], 'p2'),
+        'p2': ([video(i) for i in range(5, 10)], None)
+    }
+
+    async def scenario():
+        first = await coordinator._fetch_source(
+            coordinator._cache_key(normalize_query(QUERY), 'youtube', 5), 'youtube', QUERY, 5
+        )
+        cursors = {}
+        page = await coordinator._fetch_next_page('youtube', QUERY, cursors, set(links(first)))
+        return page, cursors
+
+    page, cursors = asyncio.run(scenario())
+    assert links(page) == links(video(i) for i in range(5, 10))
+    assert content_agent.calls == [('youtube', QUERY, None), ('youtube', QUERY, 'p2')]
+    assert cursors == {'youtube': None}
+
+
+def test_last_page_is_not_fetched_again(coordinator, content_agent):
+    content_agent.youtube_pages = {None: ([video(i) for i in range(3)], None)}
+
+    async def scenario():
+        first = await coordinator._fetch_source(
+            coordinator._cache_key(normalize_query(QUERY), 'youtube', 5), 'youtube', QUERY, 5
+        )
+        cursors = {}
+        page = await coordinator._fetch_next_page('youtube', QUERY, cursors, set(links(first)))
+        return page, cursors
+
+    page, cursors = asyncio.run(scenario())
+    assert page == []
+    assert content_agent.calls == [('youtube', QUERY, None)]
+    assert cursors == {'youtube': None}
+
+
+def test_unknown_cursor_skips_pages_already_seen(coordinator, content_agent):
+    # The first page was served from the catalog, so no cursor was recorded for it
+    content_agent.youtube_pages = {
+        None: ([video(i) for i in range(5)], 'p2'),
+        'p2': ([video(i) for i in range(5, 10)], 'p3')
+    }
+    seen = set(links(video(i) for i in range(5)))
+
+    cursors = {}
+    page = asyncio.run(coordinator._fetch_next_page('youtube', QUERY, cursors, seen))
+    assert links(page) == links(video(i) for i in range(5, 10))
+    assert content_agent.calls == [('youtube', QUERY, None), ('youtube', QUERY, 'p2')]
+    assert cursors == {'youtube': 'p3'}
+
+
+def test_exhausted_session_cursor_makes_no_call(coordinator, content_agent):
+    page = asyncio.run(coordinator._fetch_next_page('youtube', QUERY, {'youtube': None}, set()))
+    assert page == []
+    assert content_agent.calls == []
+
+
+def test_unknown_article_cursor_starts_after_the_first_page(coordinator, content_agent):
+    content_agent.articles = [article(i) for i in range(10)]
+
+    cursors = {}
+    page = asyncio.run(coordinator._fetch_next_page('web', QUERY, cursors, set()))
+    assert links(page) == links(article(i) for i in range(5, 10))
+    assert content_agent.calls == [('web', QUERY, 5)]
+    assert cursors == {'web': 10}
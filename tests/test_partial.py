@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from tests.fakes import article, video
+
+PREFERENCES = {'field': 'biology', 'topic': 'photosynthesis', 'hours': 2}
+
+
+@pytest.fixture
+def slow_analysis(coordinator, monkeypatch):
+    monkeypatch.setattr('agents.recommendation_agent.RANKING_LLM_ENABLED', False)
+
+    async def analyze_preferences(user_id):
+        await asyncio.sleep(0.2)
+        return {}
+    monkeypatch.setattr(coordinator.preference_agent, 'analyze_preferences', analyze_preferences)
+
+
+def test_partial_is_sent_while_analysis_is_pending(coordinator, content_agent, slow_analysis):
+    content_agent.youtube_pages = {None: ([video(i) for i in range(3)], None)}
+    content_agent.articles = [article(i) for i in range(3)]
+    partials = []
+
+    async def on_partial(items):
+        partials.append(items)
+
+    final, complete = asyncio.run(coordinator._recommend(1, PREFERENCES, on_partial))
+    assert complete
+    assert len(partials) == 1
+    # Every source that already answered feeds the partial list
+    assert {item.source for item in partials[0]} == {'youtube', 'web'}
+    assert len(final) == 6
+
+
+def test_no_partial_once_everything_is_in(coordinator, content_agent, monkeypatch):
+    monkeypatch.setattr('agents.recommendation_agent.RANKING_LLM_ENABLED', False)
+
+    async def analyze_preferences(user_id):
+        return {}
+    monkeypatch.setattr(coordinator.preference_agent, 'analyze_preferences', analyze_preferences)
+    content_agent.youtube_pages = {None: ([video(i) for i in range(3)], None)}
+    partials = []
+
+    async def on_partial(items):
+        partials.append(items)
+
+    final, _ = asyncio.run(coordinator._recommend(1, PREFERENCES, on_partial))
+    assert final
+    assert partials == []
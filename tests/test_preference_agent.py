@@ -0,0 +1,24 @@
+import asyncio
+from agents.preference_agent import PreferenceAgent, default_analysis
+from agents.resilience import OPEN, CircuitBreaker, circuit_breakers
+
+PREFERENCES = {'field': 'biology', 'topic': 'photosynthesis', 'hours': 2}
+
+
+class SlowModel:
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(10)
+
+
+def test_slow_analysis_falls_back_to_the_default(monkeypatch):
+    monkeypatch.setattr('agents.preference_agent.ANALYSIS_LLM_BUDGET', 0.05)
+    breaker = CircuitBreaker('gemini', min_calls=1)
+    monkeypatch.setitem(circuit_breakers, 'gemini', breaker)
+    agent = PreferenceAgent()
+    agent.model = SlowModel()
+    agent.user_preferences.set(1, PREFERENCES)
+
+    analysis = asyncio.run(asyncio.wait_for(agent.analyze_preferences(1), timeout=1))
+    assert analysis == default_analysis()
+    # The timeout is reported to the breaker like any failed call
+    assert breaker.state == OPEN
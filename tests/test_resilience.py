@@ -0,0 +1,56 @@
+import pytest
+from agents.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    options = dict(window=4, min_calls=2, threshold=0.5, slow_seconds=10, open_seconds=60)
+    options.update(kwargs)
+    return CircuitBreaker('test', **options)
+
+
+def fail(cb: CircuitBreaker):
+    with pytest.raises(RuntimeError):
+        with cb.track():
+            raise RuntimeError('upstream down')
+
+
+def test_failures_open_the_circuit():
+    cb = breaker()
+    fail(cb)
+    fail(cb)
+    assert cb.state == OPEN
+    with pytest.raises(CircuitOpen):
+        cb.check()
+
+
+def test_calls_in_flight_when_the_circuit_opens_are_ignored():
+    cb = breaker()
+    in_flight = cb.track()
+    in_flight.__enter__()
+    fail(cb)
+    fail(cb)
+    assert cb.state == OPEN
+    cb._opened_at -= cb.open_seconds
+    cb.check()
+    assert cb.state == HALF_OPEN
+    # A success that started before the circuit opened is not the half-open probe's answer
+    in_flight.__exit__(None, None, None)
+    assert cb.state == HALF_OPEN
+    with cb.track():
+        pass
+    assert cb.state == CLOSED
+
+
+def test_late_failure_does_not_reopen_a_closed_circuit():
+    cb = breaker(min_calls=1)
+    in_flight = cb.track()
+    in_flight.__enter__()
+    fail(cb)
+    cb._opened_at -= cb.open_seconds
+    cb.check()
+    with cb.track():
+        pass
+    assert cb.state == CLOSED
+    error = RuntimeError('timed out long ago')
+    assert not in_flight.__exit__(RuntimeError, error, None)  # The failure still propagates
+    assert cb.state == CLOSED
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from agents.rate_limiter import BACKGROUND, QuotaExceeded, RateLimiter, TokenBucket, background_priority
+from agents.singleflight import SingleFlight
+
+
+def limiter() -> RateLimiter:
+    # Half of the budget is reserved for interactive work and only half a unit above it is left
+    bucket = TokenBucket(capacity=10, refill_per_second=0, background_reserve=0.5)
+    bucket.tokens = 5.5
+    return RateLimiter({'serp': bucket}, interactive_max_wait=0)
+
+
+def test_interactive_caller_promotes_background_call():
+    rate_limiter = limiter()
+    flight = SingleFlight()
+
+    async def search():
+        await asyncio.sleep(0.01)
+        await rate_limiter.acquire('serp', 'search')
+        return 'results'
+
+    async def scenario():
+        async def prefetch():
+            with background_priority():
+                return await flight.do('q', search)
+        background = asyncio.ensure_future(prefetch())
+        await asyncio.sleep(0)
+        interactive = await flight.do('q', search)
+        return await background, interactive
+
+    assert asyncio.run(scenario()) == ('results', 'results')
+    assert flight.stats()['executed'] == 1
+
+
+def test_interactive_caller_retries_after_background_quota_error():
+    rate_limiter = limiter()
+    flight = SingleFlight()
+
+    async def search():
+        try:
+            await rate_limiter.acquire('serp', 'search')
+        except QuotaExceeded:
+            await asyncio.sleep(0.01)  # The interactive caller joins before the error reaches it
+            raise
+        return 'results'
+
+    async def scenario():
+        async def prefetch():
+            with background_priority():
+                return await flight.do('q', search)
+        background = asyncio.ensure_future(prefetch())
+        await asyncio.sleep(0.005)
+        interactive = await flight.do('q', search)
+        with pytest.raises(QuotaExceeded) as error:
+            await background
+        return error.value, interactive
+
+    error, interactive = asyncio.run(scenario())
+    assert error.priority == BACKGROUND
+    assert interactive == 'results'
+    assert flight.stats()['executed'] == 2
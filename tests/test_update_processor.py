@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime
+from telegram import Chat, Message, Update, User
+from main import PerUserUpdateProcessor
+
+update_ids = iter(range(1, 1000))
+
+
+def update(user_id: int, text: str) -> Update:
+    user = User(user_id, f"user{user_id}", False)
+    message = Message(next(update_ids), datetime.now(), Chat(user_id, 'private'), from_user=user, text=text)
+    return Update(message.message_id, message=message)
+
+
+def test_updates_run_in_order_per_user_and_concurrently_across_users():
+    events = []
+
+    async def handle(name: str, delay: float):
+        events.append(('start', name))
+        await asyncio.sleep(delay)
+        events.append(('end', name))
+
+    async def scenario():
+        processor = PerUserUpdateProcessor(8)
+        await asyncio.gather(
+            processor.process_update(update(1, '/recommend'), handle('a1', 0.05)),
+            processor.process_update(update(2, '/recommend'), handle('b1', 0.01)),
+            processor.process_update(update(1, '/more'), handle('a2', 0.01)),
+            processor.process_update(update(2, 'halo'), handle('b2', 0.01))
+        )
+
+    asyncio.run(scenario())
+    # A user's second update only starts after their first one finished
+    assert events.index(('end', 'a1')) < events.index(('start', 'a2'))
+    assert events.index(('end', 'b1')) < events.index(('start', 'b2'))
+    # User 2 is not held up behind user 1's slow update
+    assert events.index(('end', 'b2')) < events.index(('end', 'a1'))
+
+
+def test_repeated_exclusive_command_is_dropped_while_the_first_runs():
+    handled, notices = [], []
+
+    async def handle(name: str):
+        await asyncio.sleep(0.01)
+        handled.append(name)
+
+    async def on_duplicate(upd: Update):
+        notices.append(upd.effective_user.id)
+
+    async def scenario():
+        processor = PerUserUpdateProcessor(8, exclusive_commands=('recommend',), on_duplicate=on_duplicate)
+        await asyncio.gather(
+            processor.process_update(update(1, '/recommend'), handle('first')),
+            processor.process_update(update(1, '/recommend@bot'), handle('repeat')),
+            processor.process_update(update(2, '/recommend'), handle('other user')),
+            processor.process_update(update(1, '/more'), handle('more'))
+        )
+        # Once the first one finished, the command is accepted again
+        await processor.process_update(update(1, '/recommend'), handle('later'))
+
+    asyncio.run(scenario())
+    assert notices == [1]
+    assert sorted(handled) == ['first', 'later', 'more', 'other user']